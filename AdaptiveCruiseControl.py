@@ -0,0 +1,79 @@
+# AdaptiveCruiseControl.py
+import numpy as np
+
+
+class AdaptiveCruiseControl:
+    """
+    Batched adaptive cruise control: the PID controller of Car.update_velocity applied to
+    every car of a (replicas x cars) road at once.
+
+    The controller state of each car (last_error, integral_error) is kept as float
+    arrays of the road's shape.
+    """
+
+    # Controller parameters (same values as Car.update_velocity)
+    SAFE_TIME_HEADWAY = 2.0  # Desired time gap in simulation steps
+    STANDSTILL_DISTANCE = 1.0  # Desired distance gap at standstill (1 cell)
+    W_SPEED = 0.5  # Weight for speed error in combined error calculation
+    KP = 0.5  # Proportional gain
+    KI = 0.0  # Integral gain
+    KD = 0.2  # Derivative gain
+    THRESHOLD = 0.5  # Threshold for deciding when to increment/decrement speed
+    FAULT_SCALE = 0.01  # ACC cars fault with 1% of the driver fault probability
+
+    def __init__(self, shape, target_speed):
+        """
+        Initialize the controller state.
+
+        Parameters:
+            shape (tuple): Shape of the road arrays, (replicas, cars).
+            target_speed (int or np.ndarray): Speed the controller accelerates to (the road's max
+                speed), scalar or broadcastable to shape.
+        """
+        self.target_speed = target_speed
+        self.last_error = np.zeros(shape, dtype=np.float64)
+        self.integral_error = np.zeros(shape, dtype=np.float64)
+
+    def control(self, velocity, distance, velocity_of_next_car, last_error, integral_error,
+                random_values, p_fault, target_speed=None):
+        """
+        Compute the next velocity of moving ACC cars, including the reduced random slowdown.
+
+        The controller state is not modified; the caller stores the returned errors for
+        the cars that were actually controlled.
+
+        Parameters:
+            velocity (np.ndarray): Current velocities.
+            distance (np.ndarray): Distances to the next car.
+            velocity_of_next_car (np.ndarray): Velocities of the next cars.
+            last_error (np.ndarray): Combined error of the previous step.
+            integral_error (np.ndarray): Sum of the combined errors so far.
+            random_values (np.ndarray): One uniform number in [0, 1) per car.
+            p_fault (float or np.ndarray): Driver fault probability, scaled by FAULT_SCALE.
+            target_speed (int or np.ndarray, optional): Target speed of the same cars, when they are
+                a subset of the road. Defaults to the controller's target speed.
+
+        Returns:
+            tuple: (velocity, combined_error, integral_error) arrays.
+        """
+        v = velocity
+        if target_speed is None:
+            target_speed = self.target_speed
+
+        # Error: positive means we want a larger gap (too close), negative means too large a gap
+        desired_gap = self.STANDSTILL_DISTANCE + v * self.SAFE_TIME_HEADWAY
+        combined_error = (desired_gap - distance) + self.W_SPEED * (velocity_of_next_car - v)
+
+        # PID update
+        integral_error = integral_error + combined_error
+        derivative_error = combined_error - last_error
+        acceleration_change = self.KP * combined_error + self.KI * integral_error + self.KD * derivative_error
+
+        # Too close: slow down; too far: speed up towards the target speed
+        slow_down = acceleration_change > self.THRESHOLD
+        speed_up = ~slow_down & (acceleration_change < -self.THRESHOLD) & (v < target_speed)
+        new_v = v - (slow_down & (v > 0)) + speed_up
+
+        # Reduced random slowdown
+        new_v = new_v - ((new_v > 0) & (random_values < p_fault * self.FAULT_SCALE))
+        return new_v, combined_error, integral_error
@@ -1,12 +1,6 @@
 # Car.py
-import random
-
-import pygame
 import numpy as np
 import logging
-SEED = 42
-np.random.seed(SEED)
-random.seed(SEED)
 
 class Car:
     # Define possible speed offsets
@@ -16,7 +10,7 @@ class Car:
 
     def __init__(self, road_length, cell_width, max_speed, p_fault, p_slow,
                  prob_faster=0.20, prob_slower=0.10, prob_normal=0.70,
-                 position=None, velocity=np.random.randint(2, 3), color=(0, 255, 0), adaptive_cruise_control=False):
+                 position=None, velocity=2, color=(0, 255, 0), adaptive_cruise_control=False, rng=None):
 
         """
         Initialize a Car instance.
@@ -31,17 +25,19 @@ class Car:
             prob_slower (float, optional): Probability of the car being slower. Defaults to 0.10.
             prob_normal (float, optional): Probability of the car driving normally. Defaults to 0.70.
             position (int, optional): Initial position of the car. Random if None.
-            velocity (int, optional): Initial velocity of the car.
+            velocity (int, optional): Initial velocity of the car. Defaults to 2; random if None.
             color (tuple, optional): RGB color of the car.
             adaptive_cruise_control (bool, optional): Whether the car uses ACC.
+            rng (np.random.Generator, optional): Random generator of the run. A freshly seeded one if None.
         """
         self.road_length = road_length
         self.cell_width = cell_width
         self.max_speed = max_speed
         self.p_fault = p_fault
         self.p_slow = p_slow
-        self.position = position if position is not None else np.random.randint(0, road_length)
-        self.velocity = self.velocity = velocity if velocity is not None else np.random.randint(1, max_speed + 1)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.position = position if position is not None else self.rng.integers(0, road_length)
+        self.velocity = self.velocity = velocity if velocity is not None else self.rng.integers(1, max_speed + 1)
 
         self.color = color
         self.adaptive_cruise_control = adaptive_cruise_control
@@ -82,13 +78,13 @@ class Car:
             raise ValueError("Probabilities must sum to 1.")
 
         # Choose a category based on the defined probabilities
-        category = np.random.choice(categories, p=probabilities)
+        category = self.rng.choice(categories, p=probabilities)
 
         # Assign speed offset based on the chosen category
         if category == 'faster':
-            self.speed_offset = np.random.choice(self.SPEED_FAST)
+            self.speed_offset = self.rng.choice(self.SPEED_FAST)
         elif category == 'slower':
-            self.speed_offset = np.random.choice(self.SPEED_SLOW)
+            self.speed_offset = self.rng.choice(self.SPEED_SLOW)
         else:
             self.speed_offset = 0
 
@@ -110,7 +106,7 @@ class Car:
                     self.velocity = 1
                     self.slow_to_start = False
                 else:
-                    if np.random.rand() < self.p_slow:
+                    if self.rng.random() < self.p_slow:
                         self.slow_to_start = True
                         self.velocity = 0
                     else:
@@ -158,7 +154,7 @@ class Car:
 
             # Reduce random slowdowns drastically for ACC
             effective_p_fault = self.p_fault * 0.01  # 1% of original fault probability
-            if self.velocity > 0 and np.random.rand() < effective_p_fault:
+            if self.velocity > 0 and self.rng.random() < effective_p_fault:
                 self.velocity = max(self.velocity - 1, 0)
 
         else:
@@ -185,7 +181,7 @@ class Car:
 
             # Rule 5: Randomization
             if self.velocity > 0:
-                if np.random.rand() < self.p_fault:
+                if self.rng.random() < self.p_fault:
                     self.velocity = max(self.velocity - 1, 0)
 
     def move(self):
@@ -208,6 +204,8 @@ class Car:
             car_height (int): Height of the car rectangle.
             highlight (bool, optional): Whether to highlight the car.
         """
+        import pygame  # Only needed for display, so headless runs do not load it
+
         x = self.position * self.cell_width + (self.cell_width * 0.1)
         y = road_y - car_height // 2
 
@@ -1,11 +1,26 @@
+import multiprocessing
+import os
+
 import matplotlib
 matplotlib.use('Agg')  # Use a non-interactive backend suitable for headless environments
 import matplotlib.pyplot as plt
+from matplotlib.colors import ListedColormap
 import numpy as np
 import seaborn as sns
 
+from Car import Car
+from KeyframeTrajectory import KeyframeTrajectory
+from TrajectoryRecorder import load_trajectory
+
 COLOR_RED = "#E53D00"
 
+# Pixels of the space-time diagram rasterized per batch of frames, bounding its memory on long runs
+SPACE_TIME_BATCH_PIXELS = 1 << 24
+
+# Per-step series of simulation_data drawn over time; runs with record="summary" have none of them
+TIME_SERIES_KEYS = ('time_steps', 'flow_rate_acc', 'flow_rate_no_acc', 'jam_lengths_acc', 'jam_lengths_no_acc',
+                    'fraction_stopped_road1', 'fraction_stopped_road2', 'delay_acc', 'delay_no_acc')
+
 
 class HeadLessMeasurementAndPlotter:
     def __init__(self, output_dir="plots"):
@@ -17,6 +32,80 @@ class HeadLessMeasurementAndPlotter:
         """
         self.output_dir = output_dir
 
+    def plot_all(self, simulation_data, cars, trajectories=None, replica=0, processes=None):
+        """
+        Render every figure of a headless run concurrently in a process pool.
+
+        Every figure is one task that gets only the arrays it draws (the car-level values
+        are extracted here, so the cars are never sent to the workers). Returns when every
+        PNG is written; an error in any figure is raised here.
+
+        The figures over time need the per-step series of TIME_SERIES_KEYS; they are skipped
+        for the summary-only data of record="summary", the others are drawn either way.
+
+        Parameters:
+            simulation_data (dict): Simulation data of a headless run of both roads.
+            cars (tuple): (cars of road 1, cars of road 2), as returned by run_simulation.
+            trajectories (dict, optional): Road name ("road1", "road2") -> directory of its recorded
+                trajectory, to also draw the space-time diagrams. Each worker opens its trajectory itself.
+            replica (int, optional): Replica of the trajectories to draw. Defaults to 0.
+            processes (int, optional): Worker processes; all CPUs if None, 1 to render in this process.
+        """
+        cars_road1, cars_road2 = cars
+        simulation_params = {key: simulation_data[key] for key in ('L', 'N', 'vmax', 'p_fault', 'p_slow', 'rho')}
+        missing = [key for key in TIME_SERIES_KEYS if key not in simulation_data]
+        if 0 < len(missing) < len(TIME_SERIES_KEYS):
+            raise ValueError(f"simulation_data has only some of the per-step series, missing: {', '.join(missing)}")
+
+        velocities_acc = np.array([car.velocity for car in cars_road1])
+        velocities_no_acc = np.array([car.velocity for car in cars_road2])
+        stops_acc = np.array([car.stops for car in cars_road1])
+        stops_no_acc = np.array([car.stops for car in cars_road2])
+        speed_offsets_no_acc = np.array([car.speed_offset for car in cars_road2])
+        # Percentages of faster and slower drivers
+        percent_faster = np.mean(speed_offsets_no_acc > 0) * 100 if len(cars_road2) else 0
+        percent_slower = np.mean(speed_offsets_no_acc < 0) * 100 if len(cars_road2) else 0
+
+        # (method name, arguments) of every figure, the slow KDE figures first
+        tasks = [
+            ('plot_distance_traveled_distribution', (np.array([car.total_distance for car in cars_road1]),
+                                                     np.array([car.total_distance for car in cars_road2]),
+                                                     simulation_params)),
+            ('plot_stop_start_frequency_distribution', (simulation_data['stop_start_acc'],
+                                                        simulation_data['stop_start_no_acc'], simulation_params)),
+            ('plot_velocity_distribution', (velocities_acc, velocities_no_acc, simulation_params,
+                                            percent_faster, percent_slower)),
+            ('plot_velocity_cdf', (velocities_acc, velocities_no_acc, simulation_params)),
+        ]
+        if not missing:
+            time_steps = simulation_data['time_steps']
+            tasks += [
+                ('plot_fraction_stopped_over_time', (time_steps, simulation_data['fraction_stopped_road1'],
+                                                     simulation_data['fraction_stopped_road2'], simulation_params)),
+                ('plot_delay_over_time', (time_steps, simulation_data['delay_acc'], simulation_data['delay_no_acc'],
+                                          simulation_params)),
+            ]
+            jam_lengths_acc = simulation_data['jam_lengths_acc']
+            jam_lengths_no_acc = simulation_data['jam_lengths_no_acc']
+            if len(jam_lengths_acc) and len(jam_lengths_no_acc) and len(stops_acc) and len(stops_no_acc):
+                tasks.insert(0, ('plot_additional_metrics', (jam_lengths_acc, jam_lengths_no_acc, stops_acc,
+                                                             stops_no_acc, simulation_params)))
+            flow_rate_acc = simulation_data['flow_rate_acc']
+            flow_rate_no_acc = simulation_data['flow_rate_no_acc']
+            if len(time_steps) == len(flow_rate_acc) == len(flow_rate_no_acc):
+                tasks.append(('plot_flow_rate', (flow_rate_acc, flow_rate_no_acc, time_steps, simulation_params)))
+        for road, directory in (trajectories or {}).items():
+            tasks.append(('plot_recorded_space_time_diagram', (directory, simulation_params, replica, road)))
+
+        tasks = [(self.output_dir, name, args) for name, args in tasks]
+        if processes == 1:
+            for task in tasks:
+                _render(task)
+            return
+        with multiprocessing.Pool(min(processes or multiprocessing.cpu_count(), len(tasks))) as pool:
+            for _ in pool.imap_unordered(_render, tasks):
+                pass
+
     def plot_velocity_distribution(self, velocities_acc, velocities_no_acc, simulation_params, percent_faster, percent_slower):
         L = simulation_params['L']
         N = simulation_params['N']
@@ -272,3 +361,99 @@ class HeadLessMeasurementAndPlotter:
         plt.tight_layout()
         plt.savefig(f"{self.output_dir}/velocity_cdf.png", dpi=300)
         plt.close()
+
+    def plot_space_time_diagram(self, position, velocity, simulation_params, active=None, road_name="road1",
+                                max_size=(2000, 2000), pooling="max", cmap="RdYlGn_r"):
+        """
+        Save the space-time diagram of a road: time runs down, position across, one pixel per cell and step.
+
+        The diagram is rasterized with NumPy instead of drawn with matplotlib: the velocity colour
+        of every car is written into a (steps x L) uint8 image, 0 for empty cells and 255 for
+        stopped cars, which plt.imsave writes out pixel for pixel. Runs longer (or roads wider)
+        than max_size are downsampled by pooling blocks of pixels, one batch of frames at a time,
+        so trajectories larger than memory can be drawn from load_trajectory's memory maps.
+
+        Parameters:
+            position (np.ndarray): (frames, cars) positions, e.g. load_trajectory(...)['position'][:, 0].
+            velocity (np.ndarray): (frames, cars) velocities.
+            simulation_params (dict): Simulation parameters; L and vmax are used.
+            active (np.ndarray, optional): (cars,) mask of the car slots that hold a car. Defaults to all.
+            road_name (str, optional): Suffix of the file name. Defaults to "road1".
+            max_size (tuple, optional): Largest (rows, columns) of the image. Defaults to (2000, 2000).
+            pooling (str, optional): "max" keeps the slowest car of every block, so jams stay visible;
+                "mean" averages the block, empty cells included. Defaults to "max".
+            cmap (str, optional): Colormap from moving (low) to stopped (high) cars. Defaults to "RdYlGn_r".
+
+        Returns:
+            np.ndarray: The saved uint8 image.
+        """
+        if pooling not in ("max", "mean"):
+            raise ValueError(f"Unknown pooling: {pooling}")
+        L = simulation_params['L']
+        # Faster drivers go up to max(Car.SPEED_FAST) cells per step above vmax
+        top_speed = simulation_params['vmax'] + max(Car.SPEED_FAST)
+        frames = len(position)
+        if active is None:
+            active = np.ones(np.shape(position)[1], dtype=bool)
+
+        rows = max(-(-frames // max_size[0]), 1)
+        columns = max(-(-L // max_size[1]), 1)
+        batch = max(SPACE_TIME_BATCH_PIXELS // (L * rows), 1) * rows
+        blocks = []
+        for start in range(0, frames, batch):
+            batch_position = np.asarray(position[start:start + batch])[:, active]
+            batch_velocity = np.clip(np.asarray(velocity[start:start + batch], dtype=np.int64)[:, active], 0, top_speed)
+            image = np.zeros((len(batch_position), L), dtype=np.uint8)
+            image[np.arange(len(batch_position))[:, None], batch_position] = \
+                1 + (top_speed - batch_velocity) * 254 // top_speed
+            blocks.append(_pool_blocks(image, rows, columns, pooling))
+        image = np.concatenate(blocks) if blocks else np.zeros((0, -(-L // columns)), dtype=np.uint8)
+
+        # Empty cells are white, cars take the colormap from moving to stopped
+        colormap = ListedColormap(np.vstack([[1.0, 1.0, 1.0, 1.0], plt.get_cmap(cmap)(np.linspace(0, 1, 255))]))
+        plt.imsave(f"{self.output_dir}/space_time_diagram_{road_name}.png", image, cmap=colormap, vmin=0, vmax=255)
+        return image
+
+    def plot_recorded_space_time_diagram(self, directory, simulation_params, replica=0, road_name="road1"):
+        """
+        Save the space-time diagram of one replica of a recorded trajectory.
+
+        A memmap trajectory is read from disk one batch of frames at a time; a keyframe
+        trajectory is decoded here, so in a worker of plot_all only the worker holds it.
+
+        Parameters:
+            directory (str): Directory of the trajectory, in either format.
+            simulation_params (dict): Simulation parameters; L and vmax are used.
+            replica (int, optional): Replica to draw. Defaults to 0.
+            road_name (str, optional): Suffix of the file name. Defaults to "road1".
+
+        Returns:
+            np.ndarray: The saved uint8 image.
+        """
+        if os.path.exists(os.path.join(directory, "meta.json")):
+            recorded = KeyframeTrajectory(directory).window()
+        else:
+            recorded = load_trajectory(directory)
+        return self.plot_space_time_diagram(recorded['position'][:, replica], recorded['velocity'][:, replica],
+                                            simulation_params, recorded['active'][replica], road_name)
+
+
+def _render(task):
+    """
+    Render one figure of plot_all in a worker.
+    """
+    output_dir, name, args = task
+    getattr(HeadLessMeasurementAndPlotter(output_dir), name)(*args)
+
+
+def _pool_blocks(image, rows, columns, pooling):
+    """
+    Downsample an image by the max or the mean of its (rows x columns) blocks; edge blocks are padded with 0.
+    """
+    if rows == columns == 1:
+        return image
+    image = np.pad(image, ((0, -image.shape[0] % rows), (0, -image.shape[1] % columns)))
+    blocks = image.reshape(image.shape[0] // rows, rows, image.shape[1] // columns, columns)
+    if pooling == "max":
+        return blocks.max(axis=(1, 3))
+    return np.rint(blocks.mean(axis=(1, 3))).astype(np.uint8)
@@ -0,0 +1,246 @@
+# KeyframeTrajectory.py
+import json
+import os
+import zlib
+
+import numpy as np
+
+from TrajectoryRecorder import POSITION_DTYPE, VELOCITY_DTYPE
+
+# Header of an encoded chunk: number of frames and bit planes of the velocity changes and of the residuals
+_CHUNK_HEADER = np.dtype([('frames', '<i4'), ('velocity_planes', '<i4'), ('residual_planes', '<i4')])
+
+
+class KeyframeTrajectoryRecorder:
+    """
+    Records the positions and velocities of every car of a road in a compact keyframe + delta format.
+
+    Frames are grouped in chunks of keyframe_interval frames. A chunk starts with a full
+    keyframe (int16 positions, int8 velocities); every following frame only stores the change
+    of each velocity and the residual of each move (displacement minus velocity, 0 whenever
+    every step is recorded). Both are zigzag-coded, split into bit planes and packed, and the
+    chunk is zlib-compressed. Most cars keep their speed from one step to the next, so the
+    planes are mostly zeros and a chunk takes a fraction of the raw frames.
+
+    A trajectory is a directory with chunks.bin (the encoded chunks), index.npy (the byte
+    offset of every chunk), active.npy (which car slots hold a car) and meta.json. Any frame
+    is rebuilt by decoding the one chunk that holds it (see KeyframeTrajectory).
+    """
+
+    def __init__(self, directory, steps, shape, road_length, every=1, keyframe_interval=256):
+        """
+        Initialize the recorder and create its files.
+
+        Parameters:
+            directory (str): Directory of the trajectory, created if missing.
+            steps (int): Number of steps of the run, None if unbounded (only used by other formats).
+            shape (tuple): (replicas, cars) shape of the road, padding included.
+            road_length (int): Length of the road, at most 32767 cells.
+            every (int, optional): Record every every-th step. Defaults to 1.
+            keyframe_interval (int, optional): Frames per chunk. Defaults to 256.
+        """
+        if road_length > np.iinfo(POSITION_DTYPE).max + 1:
+            raise ValueError(f"Roads of {road_length} cells do not fit in {np.dtype(POSITION_DTYPE).name} positions.")
+        self.directory = directory
+        self.shape = tuple(shape)
+        self.road_length = road_length
+        self.every = every
+        self.keyframe_interval = keyframe_interval
+        self.recorded = 0
+        self.active = None
+        os.makedirs(directory, exist_ok=True)
+
+        self._file = open(os.path.join(directory, "chunks.bin"), 'wb')
+        self._offsets = [0]
+        self._position = np.zeros((keyframe_interval,) + self.shape, dtype=np.int64)
+        self._velocity = np.zeros((keyframe_interval,) + self.shape, dtype=np.int64)
+        self._pending = 0
+
+    def record(self, step, position, velocity, active):
+        """
+        Record the (replicas x cars) state of one step; steps between recorded ones are skipped.
+        Recorded steps must come in order. Padding slots are stored as position 0 and velocity 0.
+        """
+        if step % self.every:
+            return
+        if step // self.every != self.recorded:
+            raise ValueError(f"Step {step} is not the next recorded step.")
+        self._position[self._pending] = np.where(active, position, 0)
+        self._velocity[self._pending] = np.where(active, velocity, 0)
+        if self.active is None:
+            self.active = np.array(active, dtype=bool)
+        self._pending += 1
+        self.recorded += 1
+        if self._pending == self.keyframe_interval:
+            self._write_chunk()
+
+    def close(self):
+        """
+        Write the last, partial chunk, the chunk index and the metadata.
+        """
+        if self._pending:
+            self._write_chunk()
+        self._file.close()
+        np.save(os.path.join(self.directory, "index.npy"), np.array(self._offsets, dtype=np.int64))
+        active = self.active if self.active is not None else np.ones(self.shape, dtype=bool)
+        np.save(os.path.join(self.directory, "active.npy"), active)
+        with open(os.path.join(self.directory, "meta.json"), 'w') as file:
+            json.dump({'shape': list(self.shape), 'road_length': self.road_length, 'every': self.every,
+                       'keyframe_interval': self.keyframe_interval, 'frames': self.recorded}, file)
+
+    def _write_chunk(self):
+        position = self._position[:self._pending]
+        velocity = self._velocity[:self._pending]
+
+        velocity_change = np.diff(velocity, axis=0)
+        # Shortest signed move from one frame to the next, around the ring
+        half = self.road_length // 2
+        displacement = (np.diff(position, axis=0) + half) % self.road_length - half
+        residual = displacement - velocity[1:]
+
+        velocity_planes, velocity_bytes = _pack_planes(velocity_change)
+        residual_planes, residual_bytes = _pack_planes(residual)
+        header = np.array([(self._pending, velocity_planes, residual_planes)], dtype=_CHUNK_HEADER)
+        chunk = b"".join([header.tobytes(), position[0].astype(POSITION_DTYPE).tobytes(),
+                          velocity[0].astype(VELOCITY_DTYPE).tobytes(), velocity_bytes, residual_bytes])
+        encoded = zlib.compress(chunk)
+        self._file.write(encoded)
+        self._offsets.append(self._offsets[-1] + len(encoded))
+        self._pending = 0
+
+
+class KeyframeTrajectory:
+    """
+    Random access to a trajectory written by KeyframeTrajectoryRecorder.
+
+    A frame is rebuilt from the keyframe of its chunk by adding up the recorded changes,
+    so reading any step decodes at most one chunk (keyframe_interval frames). The last
+    decoded chunk is kept, so consecutive reads within a chunk decode it once.
+    """
+
+    def __init__(self, directory):
+        """
+        Open a trajectory.
+
+        Parameters:
+            directory (str): Directory of the trajectory.
+        """
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+        self.shape = tuple(meta['shape'])
+        self.road_length = meta['road_length']
+        self.every = meta['every']
+        self.keyframe_interval = meta['keyframe_interval']
+        self.frames = meta['frames']
+        self.offsets = np.load(os.path.join(directory, "index.npy"))
+        self.active = np.load(os.path.join(directory, "active.npy"))
+        self.time_steps = np.arange(self.frames, dtype=np.int64) * self.every
+        self._chunks = np.memmap(os.path.join(directory, "chunks.bin"), dtype=np.uint8, mode='r') \
+            if self.offsets[-1] else np.zeros(0, dtype=np.uint8)
+        self._decoded = (None, None, None)
+
+    def state(self, step):
+        """
+        (position, velocity) arrays (replicas x cars) of the cars at a recorded step.
+        """
+        frame = self._frame(step)
+        position, velocity = self._chunk(frame // self.keyframe_interval)
+        return position[frame % self.keyframe_interval], velocity[frame % self.keyframe_interval]
+
+    def window(self, start=None, stop=None):
+        """
+        Recorded frames between two steps, decoding only the chunks they are in.
+
+        Parameters:
+            start (int, optional): First step of the window (inclusive). Defaults to the first recorded step.
+            stop (int, optional): Last step of the window (exclusive). Defaults to the end of the run.
+
+        Returns:
+            dict: 'time_steps' (frames), 'position' and 'velocity' (frames x replicas x cars)
+                and 'active' (replicas x cars), like load_trajectory.
+        """
+        first = 0 if start is None else int(np.searchsorted(self.time_steps, start))
+        last = self.frames if stop is None else int(np.searchsorted(self.time_steps, stop))
+        positions, velocities = [], []
+        for chunk in range(first // self.keyframe_interval, -(-last // self.keyframe_interval)):
+            position, velocity = self._chunk(chunk)
+            begin = chunk * self.keyframe_interval
+            frames = slice(max(first - begin, 0), last - begin)
+            positions.append(position[frames])
+            velocities.append(velocity[frames])
+        empty = np.zeros((0,) + self.shape, dtype=np.int64)
+        return {
+            'time_steps': self.time_steps[first:last],
+            'position': np.concatenate(positions) if positions else empty,
+            'velocity': np.concatenate(velocities) if velocities else empty,
+            'active': self.active,
+        }
+
+    def _frame(self, step):
+        frame, remainder = divmod(step, self.every)
+        if remainder or not 0 <= frame < self.frames:
+            raise IndexError(f"Step {step} was not recorded.")
+        return frame
+
+    def _chunk(self, chunk):
+        if self._decoded[0] == chunk:
+            return self._decoded[1:]
+
+        data = zlib.decompress(self._chunks[self.offsets[chunk]:self.offsets[chunk + 1]].tobytes())
+        header = np.frombuffer(data, dtype=_CHUNK_HEADER, count=1)[0]
+        frames, cells = int(header['frames']), int(np.prod(self.shape))
+        offset = _CHUNK_HEADER.itemsize
+        key_position = np.frombuffer(data, dtype=POSITION_DTYPE, count=cells, offset=offset)
+        offset += key_position.nbytes
+        key_velocity = np.frombuffer(data, dtype=VELOCITY_DTYPE, count=cells, offset=offset)
+        offset += key_velocity.nbytes
+
+        changes = (frames - 1) * cells
+        velocity_change, offset = _unpack_planes(data, offset, int(header['velocity_planes']), changes)
+        residual, offset = _unpack_planes(data, offset, int(header['residual_planes']), changes)
+        velocity_change = velocity_change.reshape((frames - 1,) + self.shape)
+        residual = residual.reshape((frames - 1,) + self.shape)
+
+        velocity = np.empty((frames,) + self.shape, dtype=np.int64)
+        velocity[0] = key_velocity.reshape(self.shape)
+        np.cumsum(velocity_change, axis=0, out=velocity[1:])
+        velocity[1:] += velocity[0]
+        position = np.empty((frames,) + self.shape, dtype=np.int64)
+        position[0] = key_position.reshape(self.shape)
+        np.cumsum(velocity[1:] + residual, axis=0, out=position[1:])
+        position[1:] = (position[1:] + position[0]) % self.road_length
+
+        self._decoded = (chunk, position, velocity)
+        return position, velocity
+
+
+def _pack_planes(values):
+    """
+    Zigzag-code signed integers and pack them as bit planes.
+
+    Returns:
+        tuple: (number of planes, packed bytes of the planes, lowest bit first).
+    """
+    values = values.ravel().astype(np.int64)
+    zigzag = ((values << 1) ^ (values >> 63)).astype(np.uint64)
+    planes = int(zigzag.max()).bit_length() if zigzag.size else 0
+    return planes, b"".join(np.packbits((zigzag >> np.uint64(plane)) & np.uint64(1)).tobytes()
+                            for plane in range(planes))
+
+
+def _unpack_planes(data, offset, planes, count):
+    """
+    Inverse of _pack_planes for count values stored at offset of data.
+
+    Returns:
+        tuple: (int64 values, offset after the planes).
+    """
+    zigzag = np.zeros(count, dtype=np.uint64)
+    plane_bytes = -(-count // 8)
+    for plane in range(planes):
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=plane_bytes, offset=offset), count=count)
+        zigzag |= bits.astype(np.uint64) << np.uint64(plane)
+        offset += plane_bytes
+    values = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+    return values, offset
@@ -380,6 +380,37 @@ class MeasurementAndPlotter:
             )
             self.jam_queue_process.start()
 
+    def live_metrics(self):
+        """
+        Names of the RoadMetrics metrics shown by the enabled plots.
+        """
+        names = []
+        if self.enable_flow_delay_plot:
+            names += ['average_speed', 'delay']
+        if self.enable_cars_stopped_plot:
+            names += ['stopped']
+        if self.enable_density_occupancy_plot:
+            names += ['density', 'occupancy']
+        if self.enable_jam_queue_plot:
+            names += ['jam_length', 'queue_duration']
+        return names
+
+    def update_metrics(self, step, metrics_road1, metrics_road2):
+        """
+        Send one step of RoadMetrics results (single replica) of both roads to the enabled plots.
+        """
+        m1 = {name: value[0] for name, value in metrics_road1.items()}
+        m2 = {name: value[0] for name, value in metrics_road2.items()}
+        if self.enable_flow_delay_plot:
+            self.update_flow_delay_metrics(step, m1['average_speed'], m2['average_speed'], m1['delay'], m2['delay'])
+        if self.enable_cars_stopped_plot:
+            self.update_cars_stopped_metrics(step, m1['stopped'], m2['stopped'])
+        if self.enable_density_occupancy_plot:
+            self.update_density_occupancy(step, m1['density'], m1['occupancy'], m2['density'], m2['occupancy'])
+        if self.enable_jam_queue_plot:
+            self.update_jam_queue_metrics(step, m1['jam_length'], m2['jam_length'],
+                                          m1['queue_duration'], m2['queue_duration'])
+
     def update_flow_delay_metrics(self, step, flow_acc, flow_no_acc, delay_acc, delay_no_acc):
         if self.enable_flow_delay_plot:
             try:
@@ -0,0 +1,152 @@
+# ResultCache.py
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from run_simulation import ENGINE_VERSION
+
+# Default cache location and size cap
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "traffic_simulation")
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+class ResultCache:
+    """
+    On-disk cache of simulation results, content-addressed by the parameters, seed and engine version.
+
+    Every entry is one .npz file named after the SHA-256 of its key, holding the summary
+    statistics of a run, values at the end of the run and, optionally, its per-step series.
+    Reading an entry marks it as recently used; when the cache grows beyond max_bytes, the
+    least recently used entries are deleted. Entries are written to a temporary file and
+    renamed, so a crash never leaves a partial entry behind.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES, version=ENGINE_VERSION):
+        """
+        Initialize the cache.
+
+        Parameters:
+            directory (str, optional): Directory of the cache files, created if missing.
+            max_bytes (int, optional): Size cap of the cache. Defaults to 1 GiB.
+            version (int, optional): Engine version in the keys. Defaults to ENGINE_VERSION.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(entry.stat().st_size for entry in self._entries())
+
+    def key(self, params, seed):
+        """
+        Hex digest addressing the result of a run (run_key with the cache's version).
+
+        Parameters:
+            params (dict): Full parameter set of the run (JSON-serializable values).
+            seed (int or np.random.SeedSequence): Seed of the run.
+        """
+        return run_key(params, seed, self.version)
+
+    def get(self, params, seed):
+        """
+        Cached result of a run, or None.
+
+        Returns:
+            dict: 'summary' (series key -> statistic -> float), 'final' (name -> float) and,
+                if it was stored, 'series' (series key -> array).
+        """
+        path = self._path(self.key(params, seed))
+        try:
+            with np.load(path) as stored:
+                arrays = {name: stored[name] for name in stored.files}
+            os.utime(path)  # Most recently used
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+            # Missing, or cut short by a crash or a full disk
+            return None
+
+        result = {'summary': {}, 'final': {}}
+        for name, value in arrays.items():
+            section, _, key = name.partition('/')
+            if section == 'summary':
+                key, _, statistic = key.partition('/')
+                result['summary'].setdefault(key, {})[statistic] = float(value)
+            elif section == 'final':
+                result['final'][key] = float(value)
+            elif section == 'series':
+                result.setdefault('series', {})[key] = value
+        return result
+
+    def put(self, params, seed, summary, final=None, series=None):
+        """
+        Store the result of a run, then evict least recently used entries beyond max_bytes.
+
+        Parameters:
+            params (dict): Full parameter set of the run.
+            seed (int or np.random.SeedSequence): Seed of the run.
+            summary (dict): Series key -> statistic -> value, like simulation_data['summary'].
+            final (dict, optional): Name -> value at the end of the run.
+            series (dict, optional): Series key -> per-step array.
+        """
+        arrays = {f"summary/{key}/{statistic}": np.float64(value)
+                  for key, statistics in summary.items() for statistic, value in statistics.items()}
+        arrays.update({f"final/{name}": np.float64(value) for name, value in (final or {}).items()})
+        arrays.update({f"series/{key}": np.asarray(values) for key, values in (series or {}).items()})
+        arrays['params'] = np.array(json.dumps(params, sort_keys=True, default=_json_value))
+
+        path = self._path(self.key(params, seed))
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as file:
+            np.savez(file, **arrays)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temporary, path)
+        self._total_bytes += os.path.getsize(path) - previous
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        self._total_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._total_bytes -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def clear(self):
+        """
+        Delete every entry.
+        """
+        for entry in self._entries():
+            os.remove(entry.path)
+        self._total_bytes = 0
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.npz')]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+
+def run_key(params, seed, version=ENGINE_VERSION):
+    """
+    Hex digest identifying a run: the SHA-256 of its parameters, seed and engine version.
+
+    Parameters:
+        params (dict): Full parameter set of the run (JSON-serializable values).
+        seed (int or np.random.SeedSequence): Seed of the run.
+        version (int, optional): Engine version. Defaults to ENGINE_VERSION.
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        seed = {'entropy': seed.entropy, 'spawn_key': list(seed.spawn_key), 'pool_size': seed.pool_size}
+    content = json.dumps({'params': params, 'seed': seed, 'version': version}, sort_keys=True, default=_json_value)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _json_value(value):
+    # NumPy scalars in the parameters hash like the equal Python numbers
+    return value.item()
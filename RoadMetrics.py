@@ -0,0 +1,223 @@
+# RoadMetrics.py
+import numpy as np
+
+
+class RoadMetrics:
+    """
+    Per-step metrics of a road, for every replica at once, computed in one pass from the
+    velocity and position arrays of the cars.
+
+    Metrics are functions registered with RoadMetrics.metric(). They run in registration
+    order and each one can use the results of the metrics it requires. Only the selected
+    metrics and their requirements are computed, so metrics nobody consumes (such as the
+    live-plot ones in headless runs) cost nothing.
+    """
+
+    # name -> (function, required metric names), in registration order
+    registry = {}
+
+    @classmethod
+    def metric(cls, name, requires=()):
+        """
+        Decorator registering a metric function f(metrics, results) -> value per replica.
+
+        Parameters:
+            name (str): Name of the metric.
+            requires (tuple, optional): Metrics that must be computed before this one.
+        """
+        def register(function):
+            cls.registry[name] = (function, tuple(requires))
+            return function
+        return register
+
+    def __init__(self, road_length, max_speed, replicas=1, metrics=None):
+        """
+        Initialize the metrics stage.
+
+        Parameters:
+            road_length (int): Length of the road.
+            max_speed (int or array-like): Maximum speed, used for the delay, per replica.
+            replicas (int, optional): Number of replicas of the road. Defaults to 1.
+            metrics (iterable, optional): Names of the metrics to compute. All registered ones if None.
+        """
+        self.road_length = road_length
+        self.max_speed = np.broadcast_to(np.asarray(max_speed, dtype=np.int64), (replicas,))
+        self.replicas = replicas
+
+        selected = set()
+        pending = list(self.registry if metrics is None else metrics)
+        while pending:
+            name = pending.pop()
+            if name not in self.registry:
+                raise ValueError(f"Unknown metric: {name}")
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.registry[name][1])
+        self.selected = [name for name in self.registry if name in selected]
+
+        # State carried from step to step
+        self.queue_duration = np.zeros(replicas, dtype=np.int64)
+
+        self.velocity = None
+        self.position = None
+        self.active = None
+
+    def compute(self, velocity, position, active=None):
+        """
+        Compute the selected metrics for the current state of the road.
+
+        Parameters:
+            velocity (np.ndarray): Car velocities, shape (cars,) or (replicas, cars).
+            position (np.ndarray): Car positions, same shape as velocity.
+            active (np.ndarray, optional): Which slots hold a car. Defaults to all of them.
+
+        Returns:
+            dict: Metric name -> array with one value per replica.
+        """
+        self.velocity = np.atleast_2d(np.asarray(velocity, dtype=np.int64))
+        self.position = np.atleast_2d(np.asarray(position, dtype=np.int64))
+        self.active = np.ones(self.velocity.shape, dtype=bool) if active is None else np.atleast_2d(active)
+        results = {}
+        for name in self.selected:
+            results[name] = self.registry[name][0](self, results)
+        return results
+
+
+def _fraction(count, total):
+    return np.divide(count, total, out=np.zeros(len(count)), where=total > 0)
+
+
+@RoadMetrics.metric('n_cars')
+def _n_cars(metrics, results):
+    return metrics.active.sum(axis=1)
+
+
+@RoadMetrics.metric('stopped_mask')
+def _stopped_mask(metrics, results):
+    return (metrics.velocity == 0) & metrics.active
+
+
+@RoadMetrics.metric('average_speed', requires=('n_cars',))
+def _average_speed(metrics, results):
+    return _fraction(np.where(metrics.active, metrics.velocity, 0).sum(axis=1), results['n_cars'])
+
+
+@RoadMetrics.metric('stopped', requires=('stopped_mask',))
+def _stopped(metrics, results):
+    return results['stopped_mask'].sum(axis=1)
+
+
+@RoadMetrics.metric('fraction_stopped', requires=('stopped', 'n_cars'))
+def _fraction_stopped(metrics, results):
+    return _fraction(results['stopped'], results['n_cars'])
+
+
+@RoadMetrics.metric('delay', requires=('average_speed',))
+def _delay(metrics, results):
+    return _fraction(metrics.max_speed - results['average_speed'], metrics.max_speed) * 100
+
+
+@RoadMetrics.metric('jams', requires=('stopped_mask',))
+def _jams(metrics, results):
+    return jam_runs(stopped_cells(metrics.road_length, metrics.position, results['stopped_mask']), sizes=False)
+
+
+@RoadMetrics.metric('jam_length', requires=('jams',))
+def _jam_length(metrics, results):
+    return results['jams'][0]
+
+
+@RoadMetrics.metric('jam_count', requires=('jams',))
+def _jam_count(metrics, results):
+    return results['jams'][1]
+
+
+@RoadMetrics.metric('queue_duration', requires=('stopped',))
+def _queue_duration(metrics, results):
+    # run_simulation used to evaluate the queue duration a second time after the live plot
+    # updates, so a jam advances it twice per step; the recorded value is the first advance.
+    # A road is jammed (longest jam > 0) exactly when one of its cars is stopped, so the
+    # jams themselves are not needed.
+    jammed = results['stopped'] > 0
+    queue_duration = np.where(jammed, metrics.queue_duration + 1, 0)
+    metrics.queue_duration = np.where(jammed, queue_duration + 1, 0)
+    return queue_duration
+
+
+@RoadMetrics.metric('density', requires=('n_cars',))
+def _density(metrics, results):
+    return results['n_cars'] / metrics.road_length
+
+
+@RoadMetrics.metric('occupancy')
+def _occupancy(metrics, results):
+    occupied = stopped_cells(metrics.road_length, metrics.position, metrics.active)
+    return occupied.sum(axis=1) / metrics.road_length * 100
+
+
+def stopped_cells(road_length, positions, stopped):
+    """
+    Boolean mask over the road cells that hold a stopped car.
+
+    Parameters:
+        road_length (int): Length of the road.
+        positions (np.ndarray): Car positions, shape (cars,) or (replicas, cars).
+        stopped (np.ndarray): Which cars are stopped, same shape as positions.
+
+    Returns:
+        np.ndarray: Mask of shape (road_length,) or (replicas, road_length).
+    """
+    positions = np.asarray(positions)
+    cells = np.zeros(positions.shape[:-1] + (road_length,), dtype=bool)
+    index = np.nonzero(stopped)
+    cells[index[:-1] + (positions[index],)] = True
+    return cells
+
+
+def jam_runs(stopped, sizes=True):
+    """
+    Find the jams (runs of consecutive stopped cells) of circular roads.
+
+    A run touching both ends of the road continues around the ring and is counted once.
+
+    Parameters:
+        stopped (np.ndarray): Mask of the cells holding a stopped car, shape (cells,) for one
+            road or (replicas, cells).
+        sizes (bool, optional): Also return the size of every jam. Defaults to True.
+
+    Returns:
+        tuple: (longest, count, sizes) with the longest jam and the number of jams of each
+            road, and the jam sizes of each road (a list of arrays for several roads);
+            (longest, count) if sizes is False.
+    """
+    stopped = np.asarray(stopped, dtype=bool)
+    single = stopped.ndim == 1
+    stopped = np.atleast_2d(stopped)
+    replicas = stopped.shape[0]
+
+    # Runs start where the padded mask steps up and end where it steps down
+    padded = np.zeros((replicas, stopped.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = stopped
+    steps = np.diff(padded, axis=1)
+    run_rows, run_starts = np.nonzero(steps == 1)
+    run_ends = np.nonzero(steps == -1)[1]
+    run_sizes = run_ends - run_starts
+
+    # Merge the run at the start of the road into the one at the end of it
+    wrapped = np.flatnonzero(stopped[:, 0] & stopped[:, -1] & ~stopped.all(axis=1))
+    if len(wrapped):
+        first_run = np.searchsorted(run_rows, wrapped)
+        last_run = np.searchsorted(run_rows, wrapped, side='right') - 1
+        run_sizes[last_run] += run_sizes[first_run]
+        keep = np.ones(len(run_sizes), dtype=bool)
+        keep[first_run] = False
+        run_rows, run_sizes = run_rows[keep], run_sizes[keep]
+
+    count = np.bincount(run_rows, minlength=replicas)
+    longest = np.zeros(replicas, dtype=np.int64)
+    np.maximum.at(longest, run_rows, run_sizes)
+    if single:
+        longest, count = int(longest[0]), int(count[0])
+    if not sizes:
+        return longest, count
+    return longest, count, run_sizes if single else np.split(run_sizes, np.cumsum(count)[:-1])
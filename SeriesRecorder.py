@@ -0,0 +1,142 @@
+# SeriesRecorder.py
+import numpy as np
+
+# Per-step series of simulation_data: key -> (road, RoadMetrics metric)
+SIMULATION_DATA_METRICS = {
+    'flow_rate_acc': (0, 'average_speed'),
+    'flow_rate_no_acc': (1, 'average_speed'),
+    'jam_lengths_acc': (0, 'queue_duration'),
+    'jam_lengths_no_acc': (1, 'queue_duration'),
+    'fraction_stopped_road1': (0, 'fraction_stopped'),
+    'fraction_stopped_road2': (1, 'fraction_stopped'),
+    'delay_acc': (0, 'delay'),
+    'delay_no_acc': (1, 'delay'),
+}
+RECORDED_METRICS = sorted({metric for _, metric in SIMULATION_DATA_METRICS.values()})
+
+# Storage type of every per-step series of simulation_data
+SERIES_DTYPES = {
+    'time_steps': np.int32,
+    'flow_rate_acc': np.float32,
+    'flow_rate_no_acc': np.float32,
+    'jam_lengths_acc': np.int32,
+    'jam_lengths_no_acc': np.int32,
+    'fraction_stopped_road1': np.float32,
+    'fraction_stopped_road2': np.float32,
+    'delay_acc': np.float32,
+    'delay_no_acc': np.float32,
+}
+
+# Recording levels
+RECORD_LEVELS = ("full", "summary")
+
+# Statistics of simulation_data['summary']
+SUMMARY_STATISTICS = ("mean", "var", "min", "max")
+
+
+class SeriesRecorder:
+    """
+    Records the per-step metrics of a run into simulation_data, for every replica at once.
+
+    With record="full", every record_every-th step is stored in preallocated typed
+    (replicas x steps) arrays. With record="summary", nothing is stored per step.
+    Either way simulation_data['summary'] holds the statistics of every series over the
+    recorded steps, from running accumulators (Welford's mean and variance, min and max)
+    fed with the float64 values, so both levels give the same statistics.
+    """
+
+    def __init__(self, steps, replicas=1, record="full", record_every=1, roads=(0, 1)):
+        """
+        Initialize the recorder.
+
+        Parameters:
+            steps (int): Maximum number of steps of the run.
+            replicas (int, optional): Number of replicas. Defaults to 1.
+            record (str, optional): "full" for the per-step series, "summary" for the statistics only.
+            record_every (int, optional): Record every record_every-th step (0, k, 2k, ...). Defaults to 1.
+            roads (tuple, optional): Roads that are simulated (0 for road 1, 1 for road 2); the
+                series of the other roads are not recorded. Defaults to both.
+        """
+        if record not in RECORD_LEVELS:
+            raise ValueError(f"Unknown recording level: {record}")
+        if record_every < 1:
+            raise ValueError("record_every must be at least 1.")
+        self.record = record
+        self.record_every = record_every
+        self.replicas = replicas
+        self.recorded = 0
+
+        self.keys = [key for key, (road, _) in SIMULATION_DATA_METRICS.items() if road in roads]
+        if record == "full":
+            length = -(-steps // record_every)
+            self.series = {key: np.zeros((replicas, length), dtype=SERIES_DTYPES[key])
+                           for key in ['time_steps'] + self.keys}
+        else:
+            self.series = None
+        shape = (len(self.keys), replicas)
+        self._mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+        self._min = np.full(shape, np.inf)
+        self._max = np.full(shape, -np.inf)
+
+    def record_metrics(self, step, metrics_road1, metrics_road2):
+        """
+        Record one step of RoadMetrics results of both roads (None for a road that is not
+        simulated); steps between recorded ones are skipped.
+        """
+        if step % self.record_every:
+            return
+        metrics = (metrics_road1, metrics_road2)
+        values = np.array([metrics[SIMULATION_DATA_METRICS[key][0]][SIMULATION_DATA_METRICS[key][1]]
+                           for key in self.keys], dtype=np.float64)
+        if self.series is not None:
+            index = step // self.record_every
+            self.series['time_steps'][:, index] = step
+            for k, key in enumerate(self.keys):
+                self.series[key][:, index] = values[k]
+
+        self.recorded += 1
+        delta = values - self._mean
+        self._mean += delta / self.recorded
+        self._m2 += delta * (values - self._mean)
+        np.minimum(self._min, values, out=self._min)
+        np.maximum(self._max, values, out=self._max)
+
+    def recorded_series(self):
+        """
+        The recorded series trimmed to the recorded steps, or None with record="summary".
+        """
+        if self.series is None:
+            return None
+        return {key: values[:, :self.recorded] for key, values in self.series.items()}
+
+    def summary(self):
+        """
+        Statistics of every series over the recorded steps (all 0 if no step was recorded).
+
+        Returns:
+            dict: Series key -> statistic -> array with one value per replica.
+        """
+        if self.recorded:
+            statistics = (self._mean, self._m2 / self.recorded, self._min, self._max)
+        else:
+            statistics = (np.zeros(self._mean.shape),) * len(SUMMARY_STATISTICS)
+        return {key: {name: statistic[k] for name, statistic in zip(SUMMARY_STATISTICS, statistics)}
+                for k, key in enumerate(self.keys)}
+
+    def fill(self, simulation_data, replica=0):
+        """
+        Store one replica of the recording in a simulation_data dictionary.
+
+        The per-step series are left out of simulation_data with record="summary", and so are
+        the series of roads that are not simulated.
+        """
+        series = self.recorded_series() or {}
+        for key in SERIES_DTYPES:
+            if key in series:
+                simulation_data[key] = series[key][replica]
+            else:
+                simulation_data.pop(key, None)
+        simulation_data['recorded_steps'] = self.recorded
+        simulation_data['summary'] = {key: {name: float(value[replica]) for name, value in statistics.items()}
+                                      for key, statistics in self.summary().items()}
@@ -0,0 +1,115 @@
+# SweepStore.py
+import os
+import shutil
+
+import numpy as np
+
+
+class SweepStore:
+    """
+    Columnar, append-only store of sweep results: one row per (grid point, replica).
+
+    The store is a directory of shards, one per append. A shard is a directory with one
+    .npy file per column (parameters, summary statistics, ...) and optionally one per
+    per-step series, whose first axis is the rows of the shard. Loading reads only the
+    files of the selected columns, and series are memory-mapped, so a window of a large
+    sweep never has to be read whole. A shard is written under a temporary name and
+    renamed when complete, so rows that were appended survive a crash of the script.
+    """
+
+    def __init__(self, directory):
+        """
+        Initialize the store, creating its directory if missing.
+
+        Parameters:
+            directory (str): Directory of the store.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, columns, series=None):
+        """
+        Append rows as a new shard.
+
+        Parameters:
+            columns (dict): Column name -> 1-D array, one value per row (numbers or strings).
+            series (dict, optional): Series name -> array of shape (rows, steps).
+        """
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        series = {name: np.asarray(values) for name, values in (series or {}).items()}
+        rows = {len(values) for values in list(columns.values()) + list(series.values())}
+        if len(rows) != 1:
+            raise ValueError("Every column and series must have one entry per row.")
+
+        shard = os.path.join(self.directory, f"shard_{len(self.shards()):06d}")
+        temporary = f"{shard}.{os.getpid()}.tmp"
+        os.makedirs(temporary)
+        for name, values in columns.items():
+            np.save(os.path.join(temporary, f"{name}.npy"), values)
+        for name, values in series.items():
+            np.save(os.path.join(temporary, f"series.{name}.npy"), values)
+        os.rename(temporary, shard)
+
+    def clear(self):
+        """
+        Delete every shard.
+        """
+        for shard in self.shards():
+            shutil.rmtree(shard)
+
+    def shards(self):
+        """
+        Paths of the complete shards, in append order.
+        """
+        return sorted(entry.path for entry in os.scandir(self.directory)
+                      if entry.is_dir() and entry.name.startswith('shard_') and not entry.name.endswith('.tmp'))
+
+    def columns(self):
+        """
+        Names of the columns and of the series of the store (those of its first shard).
+
+        Returns:
+            tuple: (column names, series names).
+        """
+        shards = self.shards()
+        names = sorted(os.listdir(shards[0])) if shards else []
+        return ([name[:-4] for name in names if not name.startswith('series.')],
+                [name[7:-4] for name in names if name.startswith('series.')])
+
+    def runs(self):
+        """
+        Keys of the runs the store holds rows of (its 'run' column, see ResultCache.run_key).
+
+        Returns:
+            set: Run keys, empty if the store has no 'run' column.
+        """
+        if 'run' not in self.columns()[0]:
+            return set()
+        return set(self.load(['run'])['run'].tolist())
+
+    def load(self, columns=None):
+        """
+        Load the selected columns of every row.
+
+        Parameters:
+            columns (list, optional): Column names to read; all columns if None.
+
+        Returns:
+            dict: Column name -> 1-D array over the rows of all shards.
+        """
+        if columns is None:
+            columns = self.columns()[0]
+        parts = {name: [] for name in columns}
+        for shard in self.shards():
+            for name in columns:
+                parts[name].append(np.load(os.path.join(shard, f"{name}.npy")))
+        return {name: np.concatenate(values) if values else np.zeros(0) for name, values in parts.items()}
+
+    def load_series(self, name):
+        """
+        Memory-mapped per-step series of every shard, in row order.
+
+        Returns:
+            list[np.memmap]: One (rows, steps) array per shard; only the slices used are read.
+        """
+        return [np.load(os.path.join(shard, f"series.{name}.npy"), mmap_mode='r') for shard in self.shards()]
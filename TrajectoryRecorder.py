@@ -0,0 +1,96 @@
+# TrajectoryRecorder.py
+import os
+
+import numpy as np
+
+# Storage types of the trajectory files: roads up to 32767 cells, speeds up to 127
+POSITION_DTYPE = np.int16
+VELOCITY_DTYPE = np.int8
+
+
+class TrajectoryRecorder:
+    """
+    Streams the positions and velocities of every car of a road into memory-mapped files.
+
+    A trajectory is a directory with position.npy and velocity.npy, (frames x replicas x cars)
+    arrays of int16 and int8 that are preallocated on disk and filled one frame per recorded
+    step, plus active.npy (which car slots hold a car) and time_steps.npy (the step of every
+    recorded frame), written when the recorder is closed. Only the pages being written are
+    held in memory, so runs far longer than RAM can be recorded, and load_trajectory()
+    slices any time window without reading the rest. Columns are cars, in the same order at every step.
+    """
+
+    def __init__(self, directory, steps, shape, road_length, every=1):
+        """
+        Initialize the recorder and create its files.
+
+        Parameters:
+            directory (str): Directory of the trajectory, created if missing.
+            steps (int): Number of steps of the run.
+            shape (tuple): (replicas, cars) shape of the road, padding included.
+            road_length (int): Length of the road, at most 32767 cells.
+            every (int, optional): Record every every-th step. Defaults to 1.
+        """
+        if road_length > np.iinfo(POSITION_DTYPE).max + 1:
+            raise ValueError(f"Roads of {road_length} cells do not fit in {np.dtype(POSITION_DTYPE).name} positions.")
+        if steps is None:
+            raise ValueError("A trajectory needs a bounded number of steps.")
+        self.directory = directory
+        self.every = every
+        self.recorded = 0
+        os.makedirs(directory, exist_ok=True)
+
+        frames = (-(-steps // every),) + tuple(shape)
+        self.position = np.lib.format.open_memmap(os.path.join(directory, "position.npy"), mode='w+',
+                                                  dtype=POSITION_DTYPE, shape=frames)
+        self.velocity = np.lib.format.open_memmap(os.path.join(directory, "velocity.npy"), mode='w+',
+                                                  dtype=VELOCITY_DTYPE, shape=frames)
+        self.active = None
+
+    def record(self, step, position, velocity, active):
+        """
+        Record the (replicas x cars) state of one step; steps between recorded ones are skipped.
+        Padding slots are stored as position 0 and velocity 0.
+        """
+        if step % self.every:
+            return
+        index = step // self.every
+        self.position[index] = np.where(active, position, 0)
+        self.velocity[index] = np.where(active, velocity, 0)
+        if self.active is None:
+            self.active = np.array(active, dtype=bool)
+        self.recorded = index + 1
+
+    def close(self):
+        """
+        Flush the recorded frames and write the step and car-slot indexes.
+        """
+        self.position.flush()
+        self.velocity.flush()
+        np.save(os.path.join(self.directory, "time_steps.npy"), np.arange(self.recorded, dtype=np.int64) * self.every)
+        active = self.active if self.active is not None else np.ones(self.position.shape[1:], dtype=bool)
+        np.save(os.path.join(self.directory, "active.npy"), active)
+
+
+def load_trajectory(directory, start=None, stop=None):
+    """
+    Memory-mapped window of a recorded trajectory.
+
+    Parameters:
+        directory (str): Directory of the trajectory.
+        start (int, optional): First step of the window (inclusive). Defaults to the first recorded step.
+        stop (int, optional): Last step of the window (exclusive). Defaults to the end of the run.
+
+    Returns:
+        dict: 'time_steps' (frames), 'position' and 'velocity' (frames x replicas x cars, read
+            from disk when used) and 'active' (replicas x cars).
+    """
+    time_steps = np.load(os.path.join(directory, "time_steps.npy"))
+    window = slice(0 if start is None else np.searchsorted(time_steps, start),
+                   len(time_steps) if stop is None else np.searchsorted(time_steps, stop))
+    return {
+        'time_steps': time_steps[window],
+        'position': np.load(os.path.join(directory, "position.npy"), mmap_mode='r')[window],
+        'velocity': np.load(os.path.join(directory, "velocity.npy"), mmap_mode='r')[window],
+        'active': np.load(os.path.join(directory, "active.npy")),
+    }
@@ -0,0 +1,58 @@
+# UniformBlocks.py
+import numpy as np
+
+
+class UniformBlocks:
+    """
+    Uniform random numbers for the vectorized engine, drawn a block of steps at a time.
+
+    Every replica has its own np.random.Generator. For each block, one call per replica
+    draws the numbers of all its cars on all roads for block_steps steps; next() then hands
+    out one step at a time by index. Generators produce the same sequence whether numbers
+    are drawn one step or many steps at a time, so results only depend on the seeds, not on
+    block_steps.
+    """
+
+    def __init__(self, rngs, n_cars, shapes, block_steps=64):
+        """
+        Initialize the block generator.
+
+        Parameters:
+            rngs (list[np.random.Generator]): One generator per replica.
+            n_cars (list[array-like]): Number of cars of every replica, one entry per road.
+            shapes (list[tuple]): (replicas, cars) shape of every road, padding included.
+            block_steps (int, optional): Number of steps drawn per block. Defaults to 64.
+        """
+        self.rngs = rngs
+        self.n_cars = [np.broadcast_to(np.asarray(n, dtype=np.int64), (len(rngs),)) for n in n_cars]
+        self.shapes = [tuple(shape) for shape in shapes]
+        self.block_steps = block_steps
+
+        # Column where each road starts in a replica's row of numbers for one step
+        self._offsets = np.cumsum([np.zeros(len(rngs), dtype=np.int64)] + self.n_cars, axis=0)
+        self._blocks = [np.zeros((block_steps,) + shape) for shape in self.shapes]
+        self._index = block_steps
+
+    def next(self):
+        """
+        Uniform numbers for one step.
+
+        Returns:
+            list[np.ndarray]: One (replicas x cars) array per road; padding slots hold 0.
+        """
+        if self._index == self.block_steps:
+            self._draw_block()
+        index = self._index
+        self._index += 1
+        return [block[index] for block in self._blocks]
+
+    def _draw_block(self):
+        """
+        Draw the next block_steps steps of every replica, one generator call per replica.
+        """
+        for r, rng in enumerate(self.rngs):
+            numbers = rng.random((self.block_steps, int(self._offsets[-1, r])))
+            for road, block in enumerate(self._blocks):
+                start, end = self._offsets[road, r], self._offsets[road + 1, r]
+                block[:, r, :end - start] = numbers[:, start:end]
+        self._index = 0
@@ -0,0 +1,419 @@
+# VectorizedRoad.py
+import numpy as np
+
+from AdaptiveCruiseControl import AdaptiveCruiseControl
+from Car import Car
+from human_driver_table import human_driver_table
+from placement import PLACEMENT_VELOCITIES, place_cars
+
+# Tracking the order of the cars pays off over sorting them every step only with at least
+# this many car slots (replicas x cars); when the tracked order broke in every replica,
+# the cars are sorted for the next ORDER_SORT_STEPS steps before tracking is tried again
+TRACKED_ORDER_MIN_CARS = 512
+ORDER_SORT_STEPS = 64
+
+
+class VectorizedRoad:
+    """
+    Struct-of-arrays representation of R independent copies (replicas) of a circular road.
+
+    Every per-car attribute of Car (position, velocity, speed offset, stops,
+    distance, ACC controller state, ...) is stored as one (replicas x cars) NumPy
+    array, and all replicas are advanced together with array operations. The
+    update rules are the same as Car.update_velocity followed by Car.move.
+
+    Replicas may hold different numbers of cars: rows are padded to the largest
+    N and the padding slots are masked out by `active`.
+    """
+
+    def __init__(self, road_length, max_speed, p_fault, p_slow, positions, velocities,
+                 speed_offsets=None, adaptive_cruise_control=None, active=None, rng=None):
+        """
+        Initialize a VectorizedRoad.
+
+        Parameters:
+            road_length (int): Length of the road.
+            max_speed (int or array-like): Maximum speed of the cars, per replica.
+            p_fault (float or array-like): Probability of a random slowdown (fault), per replica.
+            p_slow (float or array-like): Probability of slow-to-start behavior, per replica.
+            positions (array-like): Initial position of every car, shape (replicas, cars) or (cars,).
+            velocities (array-like): Initial velocity of every car.
+            speed_offsets (array-like, optional): Speed offset of every car. Defaults to 0.
+            adaptive_cruise_control (array-like, optional): Whether each car uses ACC. Defaults to False.
+            active (array-like, optional): Which slots hold a car. Defaults to all of them.
+            rng (np.random.Generator, optional): Generator used by step() when no random values
+                are passed. A freshly seeded one if None.
+        """
+        self.road_length = road_length
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.position = np.atleast_2d(np.asarray(positions, dtype=np.int64)).copy()
+        self.velocity = np.atleast_2d(np.asarray(velocities, dtype=np.int64)).copy()
+        shape = self.position.shape
+        replicas = shape[0]
+
+        if speed_offsets is None:
+            speed_offsets = np.zeros(shape)
+        if adaptive_cruise_control is None:
+            adaptive_cruise_control = np.zeros(shape, dtype=bool)
+        if active is None:
+            active = np.ones(shape, dtype=bool)
+        self.speed_offset = np.atleast_2d(np.asarray(speed_offsets, dtype=np.int64)).copy()
+        self.active = np.atleast_2d(np.asarray(active, dtype=bool)).copy()
+        self.adaptive_cruise_control = np.atleast_2d(np.asarray(adaptive_cruise_control, dtype=bool)) & self.active
+        self._any_acc = bool(self.adaptive_cruise_control.any())
+        self._all_acc = bool((self.adaptive_cruise_control | ~self.active).all())
+
+        self.max_speed = np.broadcast_to(np.asarray(max_speed, dtype=np.int64).reshape(-1, 1), (replicas, 1)).copy()
+        self.p_fault = np.broadcast_to(np.asarray(p_fault, dtype=np.float64).reshape(-1, 1), (replicas, 1)).copy()
+        self.p_slow = np.broadcast_to(np.asarray(p_slow, dtype=np.float64).reshape(-1, 1), (replicas, 1)).copy()
+
+        # Padding slots sit beyond the end of the road so they sort after every car
+        self.n_cars = self.active.sum(axis=1)
+        padding = ~self.active
+        self.position[padding] = road_length + np.nonzero(padding)[1]
+        self.velocity[padding] = 0
+        self.speed_offset[padding] = 0
+
+        # Human drivers look their next velocity up in a table of rules 2-4. Velocities never
+        # exceed the initial ones or the effective maximum speed, which bounds the table.
+        # The rules only depend on max_speed + speed_offset, so the maximum speed of each
+        # replica is folded into the offsets of a table built for the lowest one.
+        if not self._all_acc:
+            base_speed = int(self.max_speed.min())
+            table_offset = self.speed_offset + self.max_speed - base_speed
+            max_velocity = max(base_speed + int(table_offset.max()), int(self.velocity.max()),
+                               int(self.max_speed.max()))
+            self._human_table = human_driver_table(base_speed, int(table_offset.min()),
+                                                   int(table_offset.max()), max_velocity)
+            self._offset_index = self._human_table.offset_index(table_offset)
+
+        self._rows = np.arange(replicas)
+        self._columns = np.arange(shape[1])
+        # Start of every replica in the flattened (replicas x cars) arrays, for gathers by car index
+        self._row_offsets = self._rows[:, None] * shape[1]
+        # Index of the next car in sorted order; the last car of a replica wraps to the first
+        self._next_sorted = np.where(self._columns < self.n_cars[:, None] - 1, self._columns + 1, self._columns)
+        self._next_sorted[self._columns == self.n_cars[:, None] - 1] = 0
+
+        # Cars rarely overtake on sparse roads, so their circular order is tracked instead of
+        # sorting every step: _ring lists the cars of each replica in road order, _head is
+        # the ring index of the car nearest to cell 0. On dense roads cars back into occupied
+        # cells (rule 2 with d = 0) and the order breaks in most steps; small roads are
+        # cheaper to sort than to check. Those are sorted while _sort_steps > 0.
+        self._track_order = self.position.size >= TRACKED_ORDER_MIN_CARS
+        self._sort_steps = 0
+        self._ring = np.zeros(shape, dtype=np.int64)
+        self._successor = np.zeros(shape, dtype=np.int64)
+        self._head = np.zeros(replicas, dtype=np.int64)
+        self._rebuild_order(self._rows)
+
+        self.total_distance = np.zeros(shape, dtype=np.int64)
+        self.stops = np.zeros(shape, dtype=np.int64)
+        self.time_in_traffic = np.zeros(shape, dtype=np.int64)
+        self.slow_to_start = np.zeros(shape, dtype=bool)
+
+        # PID controller state lives in the controller, only meaningful for ACC cars
+        self.cruise_control = AdaptiveCruiseControl(shape, self.max_speed)
+
+    @classmethod
+    def from_cars(cls, cars, road_length, max_speed, p_fault, p_slow, rng=None):
+        """
+        Build a single-replica VectorizedRoad holding the same state as a list of Car objects.
+
+        Parameters:
+            cars (list[Car]): Cars on the road, in creation order.
+            road_length (int): Length of the road.
+            max_speed (int): Maximum speed of the cars.
+            p_fault (float): Probability of a random slowdown (fault).
+            p_slow (float): Probability of slow-to-start behavior.
+            rng (np.random.Generator, optional): Generator used by step() when no random values are passed.
+        """
+        road = cls(
+            road_length, max_speed, p_fault, p_slow,
+            positions=np.array([c.position for c in cars], dtype=np.int64),
+            velocities=np.array([c.velocity for c in cars], dtype=np.int64),
+            speed_offsets=np.array([c.speed_offset for c in cars], dtype=np.int64),
+            adaptive_cruise_control=np.array([c.adaptive_cruise_control for c in cars], dtype=bool),
+            rng=rng
+        )
+        road.total_distance[0] = [c.total_distance for c in cars]
+        road.stops[0] = [c.stops for c in cars]
+        road.time_in_traffic[0] = [c.time_in_traffic for c in cars]
+        road.slow_to_start[0] = [c.slow_to_start for c in cars]
+        road.last_error[0] = [getattr(c, 'last_error', 0.0) for c in cars]
+        road.integral_error[0] = [getattr(c, 'integral_error', 0.0) for c in cars]
+        return road
+
+    @classmethod
+    def from_rngs(cls, rngs, road_length, n_cars, max_speed, p_fault, p_slow,
+                  prob_faster, prob_slower, prob_normal, cruise_control_percentage=None, velocity=2,
+                  placement="random"):
+        """
+        Build one replica per random generator, placing the cars like run_simulation does.
+
+        Parameters:
+            rngs (list[np.random.Generator]): One generator per replica.
+            road_length (int): Length of the road.
+            n_cars (int or array-like): Number of cars, per replica.
+            max_speed (int or array-like): Maximum speed of the cars, per replica.
+            p_fault (float or array-like): Probability of a random slowdown (fault), per replica.
+            p_slow (float or array-like): Probability of slow-to-start behavior, per replica.
+            prob_faster (float or array-like): Probability of a driver being faster, per replica.
+            prob_slower (float or array-like): Probability of a driver being slower, per replica.
+            prob_normal (float or array-like): Probability of a driver driving normally, per replica.
+            cruise_control_percentage (float or array-like, optional): Percentage of cars with ACC,
+                per replica. None means no ACC.
+            velocity (int, optional): Initial velocity of every car. Defaults to 2 like Car;
+                placements in PLACEMENT_VELOCITIES use theirs.
+            placement (str, optional): Initial placement of the cars (see placement.place_cars).
+        """
+        replicas = len(rngs)
+        n_cars = np.broadcast_to(np.asarray(n_cars, dtype=np.int64), (replicas,))
+        shape = (replicas, int(n_cars.max(initial=0)))
+
+        positions = np.zeros(shape, dtype=np.int64)
+        speed_offsets = np.zeros(shape, dtype=np.int64)
+        acc = np.zeros(shape, dtype=bool)
+        active = np.arange(shape[1]) < n_cars[:, None]
+
+        categories = ['faster', 'slower', 'normal']
+        probabilities = np.stack([np.broadcast_to(np.asarray(p, dtype=np.float64), (replicas,))
+                                  for p in (prob_faster, prob_slower, prob_normal)], axis=1)
+        if not np.isclose(probabilities.sum(axis=1), 1.0).all():
+            raise ValueError("Probabilities must sum to 1.")
+        if cruise_control_percentage is not None:
+            cruise_control_percentage = np.broadcast_to(
+                np.asarray(cruise_control_percentage, dtype=np.float64), (replicas,))
+
+        for r, rng in enumerate(rngs):
+            n = n_cars[r]
+            positions[r, :n] = place_cars(rng, road_length, n, placement)
+            if cruise_control_percentage is not None:
+                acc[r, :n] = rng.random(n) < cruise_control_percentage[r] / 100
+            category = rng.choice(categories, size=n, p=probabilities[r])
+            speed_offsets[r, :n] = np.where(
+                category == 'faster', rng.choice(Car.SPEED_FAST, size=n),
+                np.where(category == 'slower', rng.choice(Car.SPEED_SLOW, size=n), 0))
+        speed_offsets[acc] = 0
+
+        velocity = PLACEMENT_VELOCITIES.get(placement, velocity)
+        return cls(road_length, max_speed, p_fault, p_slow, positions, np.full(shape, velocity),
+                   speed_offsets=speed_offsets, adaptive_cruise_control=acc, active=active)
+
+    def sync_cars(self, cars, replica=0):
+        """
+        Write the array state of one replica back into the Car objects it was built from.
+
+        Parameters:
+            cars (list[Car]): Cars passed to from_cars, in the same order.
+            replica (int, optional): Replica to read the state from. Defaults to 0.
+        """
+        for i, car in enumerate(cars):
+            car.position = int(self.position[replica, i])
+            car.velocity = int(self.velocity[replica, i])
+            car.total_distance = int(self.total_distance[replica, i])
+            car.stops = int(self.stops[replica, i])
+            car.time_in_traffic = int(self.time_in_traffic[replica, i])
+            car.slow_to_start = bool(self.slow_to_start[replica, i])
+            if car.adaptive_cruise_control:
+                car.last_error = float(self.last_error[replica, i])
+                car.integral_error = float(self.integral_error[replica, i])
+
+    @property
+    def shape(self):
+        return self.position.shape
+
+    @property
+    def last_error(self):
+        return self.cruise_control.last_error
+
+    @property
+    def integral_error(self):
+        return self.cruise_control.integral_error
+
+    def average_speed(self):
+        """
+        Mean velocity of the cars of every replica (0 for empty replicas).
+        """
+        total = self.velocity.sum(axis=1)
+        return np.divide(total, self.n_cars, out=np.zeros(len(total)), where=self.n_cars > 0)
+
+    def stopped(self):
+        """
+        Boolean (replicas x cars) mask of the cars that are standing still.
+        """
+        return (self.velocity == 0) & self.active
+
+    def step(self, random_values=None):
+        """
+        Advance every replica by one time step (velocity update followed by motion).
+
+        Parameters:
+            random_values (np.ndarray, optional): One uniform number in [0, 1) per slot,
+                shape (replicas, cars). Drawn from the road's generator if None.
+        """
+        if self.shape[1] == 0:
+            return
+        if random_values is None:
+            random_values = self.rng.random(self.shape)
+
+        distance, velocity_of_next_car, first, last = self._neighbours()
+        state = self._new_velocities(None, distance, velocity_of_next_car, random_values)
+
+        # Cars are updated one after another in position order, so the last car sees
+        # the already updated velocity of the first one.
+        first_velocity = state[0][self._rows, first]
+        rows = np.flatnonzero((self.n_cars > 1) & (first_velocity != self.velocity[self._rows, first]))
+        if len(rows):
+            idx = (rows, last[rows])
+            last_state = self._new_velocities(idx, distance[idx], first_velocity[rows], random_values[idx])
+            for new, new_last in zip(state, last_state):
+                new[idx] = new_last
+
+        self.velocity, self.slow_to_start, self.cruise_control.last_error, self.cruise_control.integral_error = state
+        self._move()
+
+    def _neighbours(self):
+        """
+        Distance to the next car and velocity of the next car for every slot, plus the
+        index of the first and last car of every replica in road order.
+        """
+        L = self.road_length
+        if not self._track_order or self._sort_steps:
+            self._sort_steps = max(self._sort_steps - 1, 0)
+            self._rebuild_order(self._rows)
+            gap = (self.position.ravel()[self._successor_flat] - self.position) % L
+            velocity_of_next_car = self.velocity.ravel()[self._successor_flat]
+            return (gap - 1) % L, velocity_of_next_car, *self._first_and_last()
+
+        gap = (self.position.ravel()[self._successor_flat] - self.position) % L
+        first, last = self._first_and_last()
+
+        # The tracked order is still valid when the gaps around each ring add up to one lap
+        # (nobody overtook), cars sharing a cell follow each other in index order like in a
+        # stable sort, and the head car is the one after the single wrap-around. Otherwise
+        # fall back to sorting those replicas. Padding slots follow themselves (gap 0).
+        several = self.n_cars > 1
+        invalid = (gap.sum(axis=1) != L * several) & several
+        invalid |= ((gap == 0) & (self._successor < self._columns) & self.active).any(axis=1) & several
+        invalid |= (self.position[self._rows, first] >= self.position[self._rows, last]) & several
+        if invalid.any():
+            rows = np.flatnonzero(invalid)
+            if len(rows) == np.count_nonzero(several):
+                self._sort_steps = ORDER_SORT_STEPS
+            self._rebuild_order(rows)
+            gap[rows] = (self.position.ravel()[self._successor_flat[rows]] - self.position[rows]) % L
+            first, last = self._first_and_last()
+        # A car sharing the cell of the next car sees it a whole lap ahead, like (p_next - p - 1) % L
+        distance = (gap - 1) % L
+
+        velocity_of_next_car = self.velocity.ravel()[self._successor_flat]
+        return distance, velocity_of_next_car, first, last
+
+    def _rebuild_order(self, rows):
+        """
+        Sort the cars of the given replicas by position (stable, like sorted() over the car list)
+        and rebuild their ring order from it.
+        """
+        order = np.argsort(self.position[rows], axis=1, kind='stable')
+        offsets = self._row_offsets[:len(rows)]
+        successor = np.empty_like(order)
+        successor.ravel()[order + offsets] = order.ravel()[self._next_sorted[rows] + offsets]
+
+        self._ring[rows] = order
+        self._successor[rows] = successor
+        self._successor_flat = self._successor + self._row_offsets
+        self._head[rows] = 0
+
+    def _first_and_last(self):
+        """
+        Index of the car nearest to cell 0 and of the car furthest from it, per replica.
+        """
+        n_cars = np.maximum(self.n_cars, 1)
+        first = self._ring[self._rows, self._head]
+        last = self._ring[self._rows, (self._head - 1) % n_cars]
+        return first, last
+
+    def _new_velocities(self, idx, distance, velocity_of_next_car, random_values):
+        """
+        Apply the velocity update rules of Car.update_velocity to the cars in idx
+        (a (rows, columns) index pair, or None for every slot).
+
+        Returns:
+            tuple: New (velocity, slow_to_start, last_error, integral_error) arrays for the cars in idx.
+        """
+        if idx is None:
+            v = self.velocity
+            slow = self.slow_to_start
+            acc = self.adaptive_cruise_control
+            active = self.active
+            last_error = self.last_error
+            integral_error = self.integral_error
+            offset_index = self._offset_index if not self._all_acc else None
+            p_fault = self.p_fault
+            p_slow = self.p_slow
+            max_speed = self.max_speed
+        else:
+            v = self.velocity[idx]
+            slow = self.slow_to_start[idx]
+            acc = self.adaptive_cruise_control[idx]
+            active = self.active[idx]
+            last_error = self.last_error[idx]
+            integral_error = self.integral_error[idx]
+            offset_index = self._offset_index[idx] if not self._all_acc else None
+            p_fault = self.p_fault[idx[0], 0]
+            p_slow = self.p_slow[idx[0], 0]
+            max_speed = self.max_speed[idx[0], 0]
+        vn = velocity_of_next_car
+        d = distance
+        u = random_values
+        stopped = v == 0
+
+        # Slow-to-start (stopped cars skip all other rules)
+        can_start = d > 1
+        start = can_start & (slow | (u >= p_slow))
+        slow_new = stopped & can_start & ~slow & (u < p_slow)
+        v_stopped = start.astype(np.int64)
+
+        if self._any_acc:
+            # Adaptive cruise control (PID on gap and speed error)
+            v_acc, combined_error, integral_new = self.cruise_control.control(
+                v, d, vn, last_error, integral_error, u, p_fault, target_speed=max_speed)
+
+            moving_acc = acc & ~stopped
+            last_error = np.where(moving_acc, combined_error, last_error)
+            integral_error = np.where(moving_acc, integral_new, integral_error)
+
+        if not self._all_acc:
+            # Road 2 rules (human drivers): rules 2-4 from the table, then the random slowdown
+            v_human = self._human_table.lookup(v, d, vn, offset_index)
+            v_human = v_human - ((v_human > 0) & (u < p_fault))
+
+        if not self._any_acc:
+            v_moving = v_human
+        elif self._all_acc:
+            v_moving = v_acc
+        else:
+            v_moving = np.where(acc, v_acc, v_human)
+
+        velocity = np.where(stopped, v_stopped, v_moving) * active
+        slow_to_start = np.where(stopped, slow_new, slow) & active
+        return velocity, slow_to_start, last_error, integral_error
+
+    def _move(self):
+        """
+        Move every car by its velocity and update the per-car statistics.
+        """
+        new_position = self.position + self.velocity
+        if self._track_order:
+            # Cars passing cell 0 (backwards for negative velocities) rotate the ring order
+            wrapped = ((new_position >= self.road_length).sum(axis=1, where=self.active)
+                       - (new_position < 0).sum(axis=1, where=self.active))
+            self._head = (self._head - wrapped) % np.maximum(self.n_cars, 1)
+
+        self.position = np.where(self.active, new_position % self.road_length, self.position)
+        self.total_distance += self.velocity
+        self.stops += self.stopped()
+        self.time_in_traffic += self.active
+
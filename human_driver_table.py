@@ -0,0 +1,111 @@
+# human_driver_table.py
+import functools
+
+import numpy as np
+
+# Lowest velocity the rules can produce: rule 2 sets v = d - 1, which is -1 when there is no gap
+MIN_VELOCITY = -1
+
+
+def human_driver_rules(velocity, distance, velocity_of_next_car, effective_max_speed):
+    """
+    Apply rules 2-4 of the Road 2 model (deceleration near the next car, deceleration
+    within 2v, acceleration) to arrays of cars.
+
+    This is the non-ACC branch of Car.update_velocity without the randomization (rule 5).
+
+    Parameters:
+        velocity (np.ndarray): Current velocities (non-zero; stopped cars use slow-to-start instead).
+        distance (np.ndarray): Distances to the next car.
+        velocity_of_next_car (np.ndarray): Velocities of the next cars.
+        effective_max_speed (np.ndarray): max_speed + speed_offset of every car.
+
+    Returns:
+        np.ndarray: New velocities.
+    """
+    v = velocity
+    d = distance
+    vn = velocity_of_next_car
+
+    # Rule 2: Deceleration near next car
+    near = d <= v
+    rule2a = near & ((v < vn) | (v <= 2))
+    new_v = np.where(rule2a, d - 1, np.where(near, np.minimum(d - 1, v - 2), v))
+
+    # Rule 3: Deceleration if within 2v but not too close
+    within = ~near & (d <= 2 * v)
+    rule3a = within & (v >= vn + 4)
+    rule3b = within & ~rule3a & (vn + 2 <= v) & (v <= vn + 3)
+    new_v = np.where(rule3a, np.maximum(v - 2, 0), np.where(rule3b, np.maximum(v - 1, 0), new_v))
+
+    # Rule 4: Acceleration
+    return new_v + ((new_v < effective_max_speed) & (d > new_v + 1))
+
+
+class HumanDriverTable:
+    """
+    Rules 2-4 of the Road 2 model precomputed for every (v, d, v_next, speed_offset).
+
+    Velocities only take values in [MIN_VELOCITY, max_velocity] and every distance
+    beyond 2 * max_velocity + 2 gives the same result, so the whole rule set fits in a
+    small table and a road updates with one gather. Use human_driver_table() to get a
+    cached instance.
+    """
+
+    def __init__(self, max_speed, min_offset, max_offset, max_velocity):
+        """
+        Build the table.
+
+        Parameters:
+            max_speed (int): Maximum speed of the cars.
+            min_offset (int): Smallest speed offset of the drivers.
+            max_offset (int): Largest speed offset of the drivers.
+            max_velocity (int): Largest velocity any car on the road can have.
+        """
+        self.max_speed = max_speed
+        self.min_offset = min_offset
+        self.max_offset = max_offset
+        self.max_velocity = max_velocity
+        self.max_distance = 2 * max_velocity + 2
+
+        velocities = np.arange(MIN_VELOCITY, max_velocity + 1)
+        distances = np.arange(self.max_distance + 1)
+        offsets = np.arange(min_offset, max_offset + 1)
+        v, d, vn, offset = np.meshgrid(velocities, distances, velocities, offsets, indexing='ij')
+        self.table = human_driver_rules(v, d, vn, max_speed + offset).astype(np.int8)
+
+        self._flat_table = self.table.ravel()
+        self._strides = np.array(self.table.strides) // self.table.itemsize
+
+    def offset_index(self, speed_offset):
+        """
+        Per-car constant part of the flat table index, to be computed once per road.
+
+        Parameters:
+            speed_offset (np.ndarray): Speed offset of every car.
+        """
+        s_v, _, s_vn, s_offset = self._strides
+        return (speed_offset - self.min_offset) * s_offset - MIN_VELOCITY * (s_v + s_vn)
+
+    def lookup(self, velocity, distance, velocity_of_next_car, offset_index):
+        """
+        New velocities after rules 2-4.
+
+        Parameters:
+            velocity (np.ndarray): Current velocities.
+            distance (np.ndarray): Distances to the next car.
+            velocity_of_next_car (np.ndarray): Velocities of the next cars.
+            offset_index (np.ndarray): Result of offset_index() for the same cars.
+        """
+        s_v, s_d, s_vn, _ = self._strides
+        index = velocity * s_v + np.minimum(distance, self.max_distance) * s_d + velocity_of_next_car * s_vn
+        return self._flat_table.take(index + offset_index)
+
+
+@functools.lru_cache(maxsize=None)
+def human_driver_table(max_speed, min_offset, max_offset, max_velocity):
+    """
+    Cached HumanDriverTable, built once per (max_speed, offset range, max_velocity).
+    """
+    return HumanDriverTable(max_speed, min_offset, max_offset, max_velocity)
+
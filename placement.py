@@ -0,0 +1,48 @@
+# placement.py
+import numpy as np
+
+# Initial velocity of the placements that need a specific one: a packed jam starts standing
+PLACEMENT_VELOCITIES = {"megajam": 0}
+
+
+def place_cars(rng, road_length, n_cars, placement="random"):
+    """
+    Initial cells of the cars of a road, all distinct.
+
+    Parameters:
+        rng (np.random.Generator): Random generator of the run (only used by "random").
+        road_length (int): Length of the road.
+        n_cars (int): Number of cars, at most road_length.
+        placement (str, optional): A key of PLACEMENTS:
+            "random": uniformly random distinct cells, drawn in one call.
+            "homogeneous": evenly spaced cells starting at cell 0.
+            "megajam": all cars packed bumper to bumper from cell 0.
+
+    Returns:
+        np.ndarray: Cell of every car (int64).
+    """
+    if placement not in PLACEMENTS:
+        raise ValueError(f"Unknown placement: {placement}")
+    if n_cars > road_length:
+        raise ValueError(f"Cannot place {n_cars} cars on {road_length} cells.")
+    return PLACEMENTS[placement](rng, road_length, int(n_cars)).astype(np.int64)
+
+
+def _random_cells(rng, road_length, n_cars):
+    # A sample without replacement: no retries, however dense the road
+    return rng.choice(road_length, size=n_cars, replace=False)
+
+
+def _homogeneous_cells(rng, road_length, n_cars):
+    return np.arange(n_cars) * road_length // max(n_cars, 1)
+
+
+def _megajam_cells(rng, road_length, n_cars):
+    return np.arange(n_cars)
+
+
+PLACEMENTS = {
+    "random": _random_cells,
+    "homogeneous": _homogeneous_cells,
+    "megajam": _megajam_cells,
+}
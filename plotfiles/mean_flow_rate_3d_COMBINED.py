@@ -2,7 +2,7 @@
 
 import numpy as np
 import plotly.graph_objects as go
-from run_simulation import run_simulation
+from run_sweep import run_sweep
 
 
 def mean_flow_rate_vs_rho_pfault_plot_combined(
@@ -12,7 +12,9 @@ def mean_flow_rate_vs_rho_pfault_plot_combined(
     steps=1000,
     prob_faster=0.1,
     prob_slower=0.2,
-    prob_normal=0.7
+    prob_normal=0.7,
+    replicas=1,
+    seed=1
 ):
     """
     Generates a combined 3D surface plot for both ACC and Non-ACC Cars showing mean flow rate
@@ -26,78 +28,31 @@ def mean_flow_rate_vs_rho_pfault_plot_combined(
         prob_faster (float): Probability of faster drivers.
         prob_slower (float): Probability of slower drivers.
         prob_normal (float): Probability of normal drivers.
+        replicas (int): Number of independent runs per grid point.
+        seed (int): Seed of the sweep; runs already in the result cache are not repeated. None for fresh runs.
     """
     # Define ranges for rho and p_fault
     rho_values = np.linspace(0.0, 1.0, 21)  # 21 points from 0.0 to 1.0 inclusive
     p_fault_values = np.linspace(0, 1.0, 11)  # 11 points from 0 to 1.0
 
-    # Prepare storage for results
-    mean_flow_rate_matrix_non_acc = np.zeros((len(rho_values), len(p_fault_values)))
-    mean_flow_rate_matrix_acc = np.zeros((len(rho_values), len(p_fault_values)))
-
-    # Sweep over rho and p_fault for Non-ACC Cars
-    for i, rho in enumerate(rho_values):
-        N = int(rho * (L / 2))  # Convert rho to number of cars
-        if N == 0:
-            # If rho is 0, no cars are present; flow rate remains 0
-            mean_flow_rate_matrix_non_acc[i, :] = 0
-            print(f"Non-ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault=All Zero (No Cars)")
-        else:
-            for j, p_fault in enumerate(p_fault_values):
-                print(f"Non-ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault={p_fault:.2f}")
-                # Run the simulation
-                cars_road1, cars_road2, simulation_data = run_simulation(
-                    L=L,
-                    N=N,
-                    vmax=vmax,
-                    p_fault=p_fault,
-                    p_slow=p_slow,
-                    steps=steps,
-                    prob_faster=prob_faster,
-                    prob_slower=prob_slower,
-                    prob_normal=prob_normal,
-                    headless=True
-                )
-
-                # Compute mean flow rate for Non-ACC cars (Road 2)
-                mean_flow_rate_non_acc = (
-                    np.mean(simulation_data['flow_rate_no_acc'])
-                    if simulation_data['flow_rate_no_acc']
-                    else 0
-                )
-                mean_flow_rate_matrix_non_acc[i, j] = mean_flow_rate_non_acc
-
-    # Sweep over rho and p_fault for ACC Cars
-    for i, rho in enumerate(rho_values):
-        N = int(rho * (L / 2))  # Convert rho to number of cars
-        if N == 0:
-            # If rho is 0, no cars are present; flow rate remains 0
-            mean_flow_rate_matrix_acc[i, :] = 0
-            print(f"ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault=All Zero (No Cars)")
-        else:
-            for j, p_fault in enumerate(p_fault_values):
-                print(f"ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault={p_fault:.2f}")
-                # Run the simulation
-                cars_road1, cars_road2, simulation_data = run_simulation(
-                    L=L,
-                    N=N,
-                    vmax=vmax,
-                    p_fault=p_fault,
-                    p_slow=p_slow,
-                    steps=steps,
-                    prob_faster=prob_faster,
-                    prob_slower=prob_slower,
-                    prob_normal=prob_normal,
-                    headless=True
-                )
-
-                # Compute mean flow rate for ACC cars (Road 1)
-                mean_flow_rate_acc = (
-                    np.mean(simulation_data['flow_rate_acc'])
-                    if simulation_data['flow_rate_acc']
-                    else 0
-                )
-                mean_flow_rate_matrix_acc[i, j] = mean_flow_rate_acc
+    # Sweep over rho and p_fault for both roads; with rho=0 no cars are present and the flow rate is 0
+    summary = run_sweep(
+        {'rho': rho_values, 'p_fault': p_fault_values},
+        replicas=replicas,
+        seed=seed,
+        cache=True,
+        L=L,
+        vmax=vmax,
+        p_slow=p_slow,
+        steps=steps,
+        prob_faster=prob_faster,
+        prob_slower=prob_slower,
+        prob_normal=prob_normal
+    )['summary']
+
+    # Mean flow rate of Non-ACC cars (Road 2) and ACC cars (Road 1), averaged over the replicas
+    mean_flow_rate_matrix_non_acc = summary['flow_rate_no_acc']['mean'].mean(axis=-1)
+    mean_flow_rate_matrix_acc = summary['flow_rate_acc']['mean'].mean(axis=-1)
 
     # Create a combined 3D surface plot using Plotly
     fig_combined = go.Figure()
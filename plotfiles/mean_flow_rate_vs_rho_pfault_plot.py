@@ -2,11 +2,11 @@
 
 import numpy as np
 import plotly.graph_objects as go
-from run_simulation import run_simulation
+from run_sweep import run_sweep
 
 
 def mean_flow_rate_vs_rho_pfault_plot_non_acc(L=120, vmax=4, p_slow=0.5, steps=1000,
-                                              prob_faster=0.1, prob_slower=0.2, prob_normal=0.7):
+                                              prob_faster=0.1, prob_slower=0.2, prob_normal=0.7, replicas=1, seed=1):
     """
     Generates a 3D surface plot for Non-ACC Cars (Road 2) showing mean flow rate
     as a function of traffic density (rho) and probability of random slowdown (p_fault).
@@ -19,42 +19,31 @@ def mean_flow_rate_vs_rho_pfault_plot_non_acc(L=120, vmax=4, p_slow=0.5, steps=1
         prob_faster (float): Probability of faster drivers.
         prob_slower (float): Probability of slower drivers.
         prob_normal (float): Probability of normal drivers.
+        replicas (int): Number of independent runs per grid point.
+        seed (int): Seed of the sweep; runs already in the result cache are not repeated. None for fresh runs.
     """
     # Define ranges for rho and p_fault
     rho_values = np.linspace(0.0, 1.0, 21)  # 21 points from 0.0 to 1.0 inclusive
     p_fault_values = np.linspace(0, 1.0, 11)  # 11 points from 0 to 1.0
 
-    # Prepare storage for results
-    mean_flow_rate_matrix_non_acc = np.zeros((len(rho_values), len(p_fault_values)))
-
-    # Sweep over rho and p_fault
-    for i, rho in enumerate(rho_values):
-        N = int(rho * (L / 2))  # Convert rho to number of cars
-        if N == 0:
-            # If rho is 0, no cars are present; flow rate remains 0
-            mean_flow_rate_matrix_non_acc[i, :] = 0
-            print(f"Non-ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault=All Zero (No Cars)")
-            continue  # Skip to the next rho value
-
-        for j, p_fault in enumerate(p_fault_values):
-            print(f"Non-ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault={p_fault:.2f}")
-            # Run the simulation
-            cars_road1, cars_road2, simulation_data = run_simulation(
-                L=L,
-                N=N,
-                vmax=vmax,
-                p_fault=p_fault,
-                p_slow=p_slow,
-                steps=steps,
-                prob_faster=prob_faster,
-                prob_slower=prob_slower,
-                prob_normal=prob_normal,
-                headless=True
-            )
-
-            # Compute mean flow rate for Non-ACC cars (Road 2)
-            mean_flow_rate_non_acc = np.mean(simulation_data['flow_rate_no_acc']) if simulation_data['flow_rate_no_acc'] else 0
-            mean_flow_rate_matrix_non_acc[i, j] = mean_flow_rate_non_acc
+    # Sweep over rho and p_fault; with rho=0 no cars are present and the flow rate is 0
+    results = run_sweep(
+        {'rho': rho_values, 'p_fault': p_fault_values},
+        replicas=replicas,
+        seed=seed,
+        cache=True,
+        L=L,
+        vmax=vmax,
+        p_slow=p_slow,
+        steps=steps,
+        prob_faster=prob_faster,
+        prob_slower=prob_slower,
+        prob_normal=prob_normal,
+        roads="human"  # Only road 2 is read
+    )
+
+    # Mean flow rate for Non-ACC Cars (Road 2), averaged over the replicas
+    mean_flow_rate_matrix_non_acc = results['summary']['flow_rate_no_acc']['mean'].mean(axis=-1)
 
     # Create a 3D surface plot using Plotly for Non-ACC Cars
     fig_non_acc = go.Figure(data=[go.Surface(
@@ -84,7 +73,7 @@ def mean_flow_rate_vs_rho_pfault_plot_non_acc(L=120, vmax=4, p_slow=0.5, steps=1
 
 
 def mean_flow_rate_vs_rho_pfault_plot_acc(L=120, vmax=4, p_slow=0.5, steps=1000,
-                                          prob_faster=0.1, prob_slower=0.2, prob_normal=0.7):
+                                          prob_faster=0.1, prob_slower=0.2, prob_normal=0.7, replicas=1, seed=1):
     """
     Generates a 3D surface plot for ACC Cars (Road 1) showing mean flow rate
     as a function of traffic density (rho) and probability of random slowdown (p_fault).
@@ -97,42 +86,31 @@ def mean_flow_rate_vs_rho_pfault_plot_acc(L=120, vmax=4, p_slow=0.5, steps=1000,
         prob_faster (float): Probability of faster drivers.
         prob_slower (float): Probability of slower drivers.
         prob_normal (float): Probability of normal drivers.
+        replicas (int): Number of independent runs per grid point.
+        seed (int): Seed of the sweep; runs already in the result cache are not repeated. None for fresh runs.
     """
     # Define ranges for rho and p_fault
     rho_values = np.linspace(0.0, 1.0, 21)  # 21 points from 0.0 to 1.0 inclusive
     p_fault_values = np.linspace(0, 1.0, 11)  # 11 points from 0 to 1.0
 
-    # Prepare storage for results
-    mean_flow_rate_matrix_acc = np.zeros((len(rho_values), len(p_fault_values)))
-
-    # Sweep over rho and p_fault
-    for i, rho in enumerate(rho_values):
-        N = int(rho * (L / 2))  # Convert rho to number of cars
-        if N == 0:
-            # If rho is 0, no cars are present; flow rate remains 0
-            mean_flow_rate_matrix_acc[i, :] = 0
-            print(f"ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault=All Zero (No Cars)")
-            continue  # Skip to the next rho value
-
-        for j, p_fault in enumerate(p_fault_values):
-            print(f"ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault={p_fault:.2f}")
-            # Run the simulation
-            cars_road1, cars_road2, simulation_data = run_simulation(
-                L=L,
-                N=N,
-                vmax=vmax,
-                p_fault=p_fault,
-                p_slow=p_slow,
-                steps=steps,
-                prob_faster=prob_faster,
-                prob_slower=prob_slower,
-                prob_normal=prob_normal,
-                headless=True
-            )
-
-            # Compute mean flow rate for ACC cars (Road 1)
-            mean_flow_rate_acc = np.mean(simulation_data['flow_rate_acc']) if simulation_data['flow_rate_acc'] else 0
-            mean_flow_rate_matrix_acc[i, j] = mean_flow_rate_acc
+    # Sweep over rho and p_fault; with rho=0 no cars are present and the flow rate is 0
+    results = run_sweep(
+        {'rho': rho_values, 'p_fault': p_fault_values},
+        replicas=replicas,
+        seed=seed,
+        cache=True,
+        L=L,
+        vmax=vmax,
+        p_slow=p_slow,
+        steps=steps,
+        prob_faster=prob_faster,
+        prob_slower=prob_slower,
+        prob_normal=prob_normal,
+        roads="acc"  # Only road 1 is read
+    )
+
+    # Mean flow rate for ACC Cars (Road 1), averaged over the replicas
+    mean_flow_rate_matrix_acc = results['summary']['flow_rate_acc']['mean'].mean(axis=-1)
 
     # Create a 3D surface plot using Plotly for ACC Cars
     fig_acc = go.Figure(data=[go.Surface(
@@ -2,11 +2,11 @@
 
 import numpy as np
 import plotly.graph_objects as go
-from run_simulation import run_simulation
+from run_sweep import run_sweep
 
 
 def mean_velocity_vs_rho_pfault_plot_non_acc(L=120, vmax=4, p_slow=0.5, steps=1000,
-                                             prob_faster=0.1, prob_slower=0.2, prob_normal=0.7):
+                                             prob_faster=0.1, prob_slower=0.2, prob_normal=0.7, replicas=1, seed=1):
     """
     Generates a 3D surface plot for Non-ACC Cars (Road 2) showing mean velocity
     as a function of traffic density (rho) and probability of random slowdown (p_fault).
@@ -19,38 +19,32 @@ def mean_velocity_vs_rho_pfault_plot_non_acc(L=120, vmax=4, p_slow=0.5, steps=10
         prob_faster (float): Probability of faster drivers.
         prob_slower (float): Probability of slower drivers.
         prob_normal (float): Probability of normal drivers.
+        replicas (int): Number of independent runs per grid point.
+        seed (int): Seed of the sweep; runs already in the result cache are not repeated. None for fresh runs.
     """
     # Define ranges for rho and p_fault
     rho_values = np.linspace(0.05, 1.0, 20)  # 20 points from 0.05 to 1.0 to avoid N=0
     p_fault_values = np.linspace(0, 1.0, 11)  # 11 points from 0 to 0.5
 
-    # Prepare storage for results
-    mean_velocity_matrix_non_acc = np.zeros((len(rho_values), len(p_fault_values)))
-
     # Sweep over rho and p_fault
-    for i, rho in enumerate(rho_values):
-        N = int(rho * (L / 2))  # Convert rho to number of cars
-        if N == 0:
-            N = 1  # Ensure at least one car for simulation
-        for j, p_fault in enumerate(p_fault_values):
-            print(f"Non-ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault={p_fault:.2f}")
-            # Run the simulation
-            cars_road1, cars_road2, simulation_data = run_simulation(
-                L=L,
-                N=N,
-                vmax=vmax,
-                p_fault=p_fault,
-                p_slow=p_slow,
-                steps=steps,
-                prob_faster=prob_faster,
-                prob_slower=prob_slower,
-                prob_normal=prob_normal,
-                headless=True
-            )
-
-            # Compute mean velocity for Non-ACC cars (Road 2)
-            mean_velocity_non_acc = np.mean([car.velocity for car in cars_road2]) if cars_road2 else 0
-            mean_velocity_matrix_non_acc[i, j] = mean_velocity_non_acc
+    N_values = np.maximum((rho_values * (L / 2)).astype(int), 1)  # Ensure at least one car for simulation
+    results = run_sweep(
+        {'N': N_values, 'p_fault': p_fault_values},
+        replicas=replicas,
+        seed=seed,
+        cache=True,
+        L=L,
+        vmax=vmax,
+        p_slow=p_slow,
+        steps=steps,
+        prob_faster=prob_faster,
+        prob_slower=prob_slower,
+        prob_normal=prob_normal,
+        roads="human"  # Only road 2 is read
+    )
+
+    # Mean velocity at the end of the run for Non-ACC Cars (Road 2), averaged over the replicas
+    mean_velocity_matrix_non_acc = results['mean_velocity_no_acc'].mean(axis=-1)
 
     # Create a 3D surface plot using Plotly for Non-ACC Cars
     fig_non_acc = go.Figure(data=[go.Surface(
@@ -85,7 +79,7 @@ def mean_velocity_vs_rho_pfault_plot_non_acc(L=120, vmax=4, p_slow=0.5, steps=10
 
 
 def mean_velocity_vs_rho_pfault_plot_acc(L=120, vmax=4, p_slow=0.5, steps=1000,
-                                         prob_faster=0.1, prob_slower=0.2, prob_normal=0.7):
+                                         prob_faster=0.1, prob_slower=0.2, prob_normal=0.7, replicas=1, seed=1):
     """
     Generates a 3D surface plot for ACC Cars (Road 1) showing mean velocity
     as a function of traffic density (rho) and probability of random slowdown (p_fault).
@@ -98,38 +92,32 @@ def mean_velocity_vs_rho_pfault_plot_acc(L=120, vmax=4, p_slow=0.5, steps=1000,
         prob_faster (float): Probability of faster drivers.
         prob_slower (float): Probability of slower drivers.
         prob_normal (float): Probability of normal drivers.
+        replicas (int): Number of independent runs per grid point.
+        seed (int): Seed of the sweep; runs already in the result cache are not repeated. None for fresh runs.
     """
     # Define ranges for rho and p_fault
     rho_values = np.linspace(0.05, 1.0, 20)  # 20 points from 0.05 to 1.0 to avoid N=0
     p_fault_values = np.linspace(0, 1.0, 11)  # 11 points from 0 to 0.5
 
-    # Prepare storage for results
-    mean_velocity_matrix_acc = np.zeros((len(rho_values), len(p_fault_values)))
-
     # Sweep over rho and p_fault
-    for i, rho in enumerate(rho_values):
-        N = int(rho * (L / 2))  # Convert rho to number of cars
-        if N == 0:
-            N = 1  # Ensure at least one car for simulation
-        for j, p_fault in enumerate(p_fault_values):
-            print(f"ACC Simulation {i + 1}/{len(rho_values)} for rho={rho:.2f}, p_fault={p_fault:.2f}")
-            # Run the simulation
-            cars_road1, cars_road2, simulation_data = run_simulation(
-                L=L,
-                N=N,
-                vmax=vmax,
-                p_fault=p_fault,
-                p_slow=p_slow,
-                steps=steps,
-                prob_faster=prob_faster,
-                prob_slower=prob_slower,
-                prob_normal=prob_normal,
-                headless=True
-            )
-
-            # Compute mean velocity for ACC cars (Road 1)
-            mean_velocity_acc = np.mean([car.velocity for car in cars_road1]) if cars_road1 else 0
-            mean_velocity_matrix_acc[i, j] = mean_velocity_acc
+    N_values = np.maximum((rho_values * (L / 2)).astype(int), 1)  # Ensure at least one car for simulation
+    results = run_sweep(
+        {'N': N_values, 'p_fault': p_fault_values},
+        replicas=replicas,
+        seed=seed,
+        cache=True,
+        L=L,
+        vmax=vmax,
+        p_slow=p_slow,
+        steps=steps,
+        prob_faster=prob_faster,
+        prob_slower=prob_slower,
+        prob_normal=prob_normal,
+        roads="acc"  # Only road 1 is read
+    )
+
+    # Mean velocity at the end of the run for ACC Cars (Road 1), averaged over the replicas
+    mean_velocity_matrix_acc = results['mean_velocity_acc'].mean(axis=-1)
 
     # Create a 3D surface plot using Plotly for ACC Cars
     fig_acc = go.Figure(data=[go.Surface(
@@ -1,6 +1,6 @@
 import numpy as np
 import plotly.graph_objects as go
-from run_simulation import run_simulation
+from run_sweep import run_sweep
 
 
 def p_fault_plot():
@@ -12,46 +12,30 @@ def p_fault_plot():
     prob_faster = 0.1
     prob_slower = 0.2
     prob_normal = 0.7
+    seed = 1  # Fixed seed, so a rerun comes from the result cache
 
     # Sweep over N (to vary density) and p_fault
     N_values = np.arange(0, int(L / 2) + 1, 10)  # Every 10 cars
     p_fault_values = np.linspace(0, 0.5, 6)  # 6 values from 0 to 0.5
 
-    # Prepare storage for results
-    # We'll store average flow rates for ACC cars in a 2D array
-    flow_rate_acc_matrix = np.zeros((len(N_values), len(p_fault_values)))
-    flow_rate_no_acc_matrix = np.zeros((len(N_values), len(p_fault_values)))
-    rho_values = np.zeros((len(N_values), len(p_fault_values)))
-
-    # Run the simulations
-    for i, N in enumerate(N_values):
-        for j, p_fault in enumerate(p_fault_values):
-            # Run simulation headless with given parameters
-            cars_road1, cars_road2, simulation_data = run_simulation(
-                L=L,
-                N=N,
-                vmax=vmax,
-                p_fault=p_fault,
-                p_slow=p_slow,
-                steps=steps,
-                prob_faster=prob_faster,
-                prob_slower=prob_slower,
-                prob_normal=prob_normal,
-                headless=True
-            )
-
-            # Extract data
-            flow_rate_acc = simulation_data['flow_rate_acc']
-            flow_rate_no_acc = simulation_data['flow_rate_no_acc']
-            rho = simulation_data['rho']  # This should be N/(L/2)
-
-            # Compute mean flow rates over the simulation period
-            mean_flow_rate_acc = np.mean(flow_rate_acc) if flow_rate_acc else 0
-            mean_flow_rate_no_acc = np.mean(flow_rate_no_acc) if flow_rate_no_acc else 0
+    # Run the simulations headless with the given parameters
+    results = run_sweep(
+        {'N': N_values, 'p_fault': p_fault_values},
+        seed=seed,
+        cache=True,
+        L=L,
+        vmax=vmax,
+        p_slow=p_slow,
+        steps=steps,
+        prob_faster=prob_faster,
+        prob_slower=prob_slower,
+        prob_normal=prob_normal
+    )
 
-            flow_rate_acc_matrix[i, j] = mean_flow_rate_acc
-            flow_rate_no_acc_matrix[i, j] = mean_flow_rate_no_acc
-            rho_values[i, j] = rho
+    # Mean flow rates over the simulation period, as (N x p_fault) arrays
+    flow_rate_acc_matrix = results['summary']['flow_rate_acc']['mean'][..., 0]
+    flow_rate_no_acc_matrix = results['summary']['flow_rate_no_acc']['mean'][..., 0]
+    rho_values = np.repeat(N_values[:, None] / (L / 2), len(p_fault_values), axis=1)  # N/(L/2)
 
     # Create a 3D surface plot of flow rate_acc vs. rho vs. p_fault using Plotly
     fig = go.Figure(data=[go.Surface(
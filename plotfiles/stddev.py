@@ -1,10 +1,11 @@
 import numpy as np
-import pandas as pd
 import matplotlib
 
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-from run_simulation import run_simulation
+from ResultCache import run_key
+from SweepStore import SweepStore
+from run_simulation import run_simulation_replicas
 
 
 def main():
@@ -28,35 +29,42 @@ def main():
 
 
 
-    fraction_stopped_road1_all = []
-    fraction_stopped_road2_all = []
-    flow_rate_acc_all = []
-    flow_rate_no_acc_all = []
-    time_steps = None
+    # The store keeps the runs of earlier invocations: only the runs it does not hold yet are simulated
+    params = {'L': L, 'N': N, 'vmax': vmax, 'p_fault': p_fault, 'p_slow': p_slow, 'steps': steps,
+              'prob_faster': prob_faster, 'prob_slower': prob_slower, 'prob_normal': prob_normal}
+    seeds = np.arange(runs)
+    keys = np.array([run_key(params, int(seed)) for seed in seeds])
+    store = SweepStore("stddev_runs")
+    stored = store.runs()
+    missing = np.array([key not in stored for key in keys], dtype=bool)
 
-    # Run simulations multiple times
-    for i in range(runs):
-        cars_road1, cars_road2, simulation_data = run_simulation(
+    if missing.any():
+        # Run the missing simulations at once as independent replicas
+        _, _, simulation_data_list = run_simulation_replicas(
             L=L, N=N, vmax=vmax,
             p_fault=p_fault, p_slow=p_slow,
             steps=steps, prob_faster=prob_faster,
             prob_slower=prob_slower, prob_normal=prob_normal,
-            headless=True
+            seeds=seeds[missing].tolist()
         )
 
-        if time_steps is None:
-            time_steps = simulation_data['time_steps']
-
-        fraction_stopped_road1_all.append(simulation_data['fraction_stopped_road1'])
-        fraction_stopped_road2_all.append(simulation_data['fraction_stopped_road2'])
-        flow_rate_acc_all.append(simulation_data['flow_rate_acc'])
-        flow_rate_no_acc_all.append(simulation_data['flow_rate_no_acc'])
+        # One row per run, with its per-step series
+        n_missing = int(missing.sum())
+        store.append(
+            {'run': keys[missing], 'seed': seeds[missing], **{name: np.full(n_missing, value)
+                                                           for name, value in params.items()}},
+            series={key: np.stack([simulation_data[key] for simulation_data in simulation_data_list])
+                    for key in ('time_steps', 'fraction_stopped_road1', 'fraction_stopped_road2',
+                                'flow_rate_acc', 'flow_rate_no_acc')}
+        )
 
-    # Convert lists to arrays for easy mean/std computations
-    fraction_stopped_road1_all = np.array(fraction_stopped_road1_all)  # shape: (runs, steps)
-    fraction_stopped_road2_all = np.array(fraction_stopped_road2_all)
-    flow_rate_acc_all = np.array(flow_rate_acc_all)
-    flow_rate_no_acc_all = np.array(flow_rate_no_acc_all)
+    # (runs, steps) arrays of this configuration's runs for easy mean/std computations
+    rows = np.isin(store.load(['run'])['run'], keys)
+    time_steps = np.concatenate(store.load_series('time_steps'))[rows][0]
+    fraction_stopped_road1_all = np.concatenate(store.load_series('fraction_stopped_road1'))[rows]
+    fraction_stopped_road2_all = np.concatenate(store.load_series('fraction_stopped_road2'))[rows]
+    flow_rate_acc_all = np.concatenate(store.load_series('flow_rate_acc'))[rows]
+    flow_rate_no_acc_all = np.concatenate(store.load_series('flow_rate_no_acc'))[rows]
 
     # Compute mean and std
     fraction_stopped_road1_mean = fraction_stopped_road1_all.mean(axis=0)
@@ -71,27 +79,6 @@ def main():
     flow_rate_no_acc_mean = flow_rate_no_acc_all.mean(axis=0)
     flow_rate_no_acc_std = flow_rate_no_acc_all.std(axis=0)
 
-    # Create dataframes for CSV output
-    fraction_stopped_df = pd.DataFrame({
-        'time_step': time_steps,
-        'fraction_stopped_road1_mean': fraction_stopped_road1_mean,
-        'fraction_stopped_road1_std': fraction_stopped_road1_std,
-        'fraction_stopped_road2_mean': fraction_stopped_road2_mean,
-        'fraction_stopped_road2_std': fraction_stopped_road2_std
-    })
-
-    flow_rate_df = pd.DataFrame({
-        'time_step': time_steps,
-        'flow_rate_acc_mean': flow_rate_acc_mean,
-        'flow_rate_acc_std': flow_rate_acc_std,
-        'flow_rate_no_acc_mean': flow_rate_no_acc_mean,
-        'flow_rate_no_acc_std': flow_rate_no_acc_std
-    })
-
-    # Save CSV files
-    fraction_stopped_df.to_csv("fraction_stopped_stats.csv", index=False)
-    flow_rate_df.to_csv("flow_rate_stats.csv", index=False)
-
     # Plot fraction of stopped cars mean and std
     # Plot fraction of stopped cars mean and std
     plt.figure(figsize=(8, 5))
@@ -144,7 +131,7 @@ def main():
     plt.tight_layout()
     plt.savefig("flow_rate_mean_std_trans.png", dpi=300)
     plt.close()
-    print("Analysis completed. CSV files and plots saved.")
+    print("Analysis completed. Runs saved to 'stddev_runs' and plots saved.")
 
 
 if __name__ == "__main__":
@@ -1,12 +1,47 @@
-import sys
-import numpy as np
-import matplotlib
+import os
 
-matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
+import numpy as np
 
+# The model and the headless engines only need NumPy; pygame and the live plots
+# (MeasurementAndPlotter: Tk, seaborn) are imported when a run with a display starts.
 from Car import Car
-from MeasurementAndPlotter import MeasurementAndPlotter
+from KeyframeTrajectory import KeyframeTrajectoryRecorder
+from RoadMetrics import RoadMetrics, jam_runs, stopped_cells
+from SeriesRecorder import RECORDED_METRICS, SERIES_DTYPES, SeriesRecorder
+from TrajectoryRecorder import TrajectoryRecorder
+from UniformBlocks import UniformBlocks
+from VectorizedRoad import VectorizedRoad
+from placement import PLACEMENT_VELOCITIES, place_cars
+
+# Version of the simulation results: bump it when a change makes a seed give different
+# results, so cached results (ResultCache) of older versions are not reused
+ENGINE_VERSION = 2
+
+# Array engines for headless runs: per-car arrays with tracked order
+ROAD_ENGINES = {"vectorized": VectorizedRoad}
+
+# Cars per road from which engine="auto" runs a single headless run on the array engine: below it,
+# the per-step cost of the NumPy calls outweighs the per-car loop (1000 steps, best of 5: cars
+# 0.15 s vs vectorized 0.23-0.28 s at L=120 with N=20-60, 0.54 s vs 0.29 s at L=400 with N=200)
+AUTO_ARRAY_MIN_CARS = 128
+
+# Trajectory formats: memory-mapped raw frames, or compressed keyframes and deltas with random access
+TRAJECTORY_FORMATS = {"memmap": TrajectoryRecorder, "keyframe": KeyframeTrajectoryRecorder}
+
+# Parameters of a road in run_road_configs and their defaults (those of run_simulation)
+ROAD_CONFIG_DEFAULTS = {
+    'N': 60,
+    'vmax': 4,
+    'p_fault': 0.1,
+    'p_slow': 0.5,
+    'prob_faster': 0.70,
+    'prob_slower': 0.10,
+    'prob_normal': 0.20,
+    'cruise_control_percentage': 100,
+}
+
+# Roads a headless run simulates and records: index 0 is road 1 (ACC), index 1 is road 2 (human drivers)
+ROAD_SELECTIONS = {"both": (0, 1), "acc": (0,), "human": (1,)}
 
 
 def run_simulation(
@@ -19,11 +54,17 @@ def run_simulation(
     prob_faster=0.70,    # Probability that a driver is faster
     prob_slower=0.10,    # Probability that a driver is slower
     prob_normal=0.20,    # Probability that a driver is normal
-    headless=False
+    headless=False,
+    engine="auto",       # "cars", "vectorized" or "auto" (vectorized for large headless runs)
+    seed=None,           # int or np.random.SeedSequence of the run; fresh entropy if None
+    record="full",       # "full" per-step series or "summary" statistics only
+    record_every=1,      # Record every record_every-th step
+    roads="both",        # Roads to simulate when headless: "both", "acc" (road 1) or "human" (road 2)
+    placement="random",  # Initial placement: "random", "homogeneous" or "megajam"
+    trajectory=None,     # Directory to record the cars' positions and velocities into when headless
+    trajectory_format="memmap"  # "memmap" or "keyframe" (compressed)
 ):
-    # Ensure probabilities sum to 1
-    if not np.isclose(prob_faster + prob_slower + prob_normal, 1.0):
-        raise ValueError("prob_faster, prob_slower, and prob_normal must sum to 1.")
+    check_driver_probabilities(prob_faster, prob_slower, prob_normal)
 
     rho = N / (L / 2.0)  # rho = N / (L/2) = 2N/L
 
@@ -32,100 +73,61 @@ def run_simulation(
     SIMULATION_STEP_INTERVAL = 1000 / SIM_STEPS_PER_SECOND
     cruise_control_percentage_road1 = 100
 
+    if engine == "auto":
+        engine = "vectorized" if headless and N >= AUTO_ARRAY_MIN_CARS else "cars"
+    if headless:
+        return run_simulation_headless(L, N, vmax, p_fault, p_slow, steps, prob_faster, prob_slower, prob_normal,
+                                       cruise_control_percentage_road1=cruise_control_percentage_road1, seed=seed,
+                                       engine=engine, record=record, record_every=record_every, roads=roads,
+                                       placement=placement, trajectory=trajectory,
+                                       trajectory_format=trajectory_format)
+    elif roads != "both":
+        raise ValueError("Runs with a display show both roads.")
+    elif trajectory is not None:
+        raise ValueError("Trajectories are only recorded in headless runs.")
+    elif engine in ROAD_ENGINES:
+        raise ValueError(f"The {engine} engine only supports headless runs.")
+    elif engine != "cars":
+        raise ValueError(f"Unknown engine: {engine}")
+
+    from MeasurementAndPlotter import MeasurementAndPlotter
+
+    # Every random draw of the run comes from this generator, so runs are reproducible
+    # per seed and independent of each other (also in parallel workers)
+    rng = np.random.default_rng(seed)
+
     N_ACC_CARS = int(cruise_control_percentage_road1 / 100 * N)
 
     # Initialize simulation_data with new arrays
-    simulation_data = {
-        'time_steps': [],
-        'flow_rate_acc': [],
-        'flow_rate_no_acc': [],
-        'jam_lengths_acc': [],
-        'jam_lengths_no_acc': [],
-        'fraction_stopped_road1': [],
-        'fraction_stopped_road2': [],
-        'delay_acc': [],
-        'delay_no_acc': [],
-        'prob_faster': prob_faster,
-        'prob_slower': prob_slower,
-        'prob_normal': prob_normal,
-        'p_fault': p_fault,
-        'p_slow': p_slow,
-        'N': N,
-        'L': L,
-        'vmax': vmax,
-        'rho': rho
-    }
-
-    # Setup Pygame if not headless
-    if not headless:
-        import pygame
-        pygame.init()
-        WINDOW_WIDTH = 2500
-        WINDOW_HEIGHT = 800
-        screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        pygame.display.set_caption("Traffic Simulation")
-        font = pygame.font.SysFont(None, 24)
-        clock = pygame.time.Clock()
-        FPS = 60
-
-        WHITE = (255, 255, 255)
-        BLACK = (0, 0, 0)
-        DODGERBLUE = (30, 144, 255)
-        SALMON = (250, 128, 114)
-
-        ROAD_Y_TOP = WINDOW_HEIGHT // 3
-        ROAD_Y_BOTTOM = 2 * WINDOW_HEIGHT // 3
-        CELL_WIDTH = WINDOW_WIDTH / L
-        CAR_HEIGHT = 20
-    else:
-        WHITE = BLACK = DODGERBLUE = SALMON = None
-        CELL_WIDTH = 1
-        CAR_HEIGHT = 1
-        ROAD_Y_TOP = ROAD_Y_BOTTOM = None
+    simulation_data = new_simulation_data(L, N, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal)
+
+    # Setup Pygame
+    import pygame
+    pygame.init()
+    WINDOW_WIDTH = 2500
+    WINDOW_HEIGHT = 800
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    pygame.display.set_caption("Traffic Simulation")
+    font = pygame.font.SysFont(None, 24)
+    clock = pygame.time.Clock()
+    FPS = 60
+
+    WHITE = (255, 255, 255)
+    BLACK = (0, 0, 0)
+    DODGERBLUE = (30, 144, 255)
+    SALMON = (250, 128, 114)
+
+    ROAD_Y_TOP = WINDOW_HEIGHT // 3
+    ROAD_Y_BOTTOM = 2 * WINDOW_HEIGHT // 3
+    CELL_WIDTH = WINDOW_WIDTH / L
+    CAR_HEIGHT = 20
 
     # Initialize Roads
-    occupied_positions_road1 = set()
-    cars_road1 = []
-    for _ in range(N):
-        position = np.random.randint(0, L)
-        while position in occupied_positions_road1:
-            position = np.random.randint(0, L)
-        occupied_positions_road1.add(position)
-        acc_enabled = (np.random.rand() < (cruise_control_percentage_road1 / 100))
-        car = Car(
-            road_length=L,
-            cell_width=CELL_WIDTH,
-            max_speed=vmax,
-            p_fault=p_fault,
-            p_slow=p_slow,
-            prob_faster=prob_faster,
-            prob_slower=prob_slower,
-            prob_normal=prob_normal,
-            position=position,
-            adaptive_cruise_control=acc_enabled
-        )
-        cars_road1.append(car)
-
-    occupied_positions_road2 = set()
-    cars_road2 = []
-    for _ in range(N):
-        position = np.random.randint(0, L)
-        while position in occupied_positions_road2:
-            position = np.random.randint(0, L)
-        occupied_positions_road2.add(position)
-        car = Car(
-            road_length=L,
-            cell_width=CELL_WIDTH,
-            max_speed=vmax,
-            p_fault=p_fault,
-            p_slow=p_slow,
-            prob_faster=prob_faster,
-            prob_slower=prob_slower,
-            prob_normal=prob_normal,
-            position=position,
-            adaptive_cruise_control=False
-        )
-        cars_road2.append(car)
+    cars_road1 = initialize_road(L, N, CELL_WIDTH, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal,
+                                 cruise_control_percentage=cruise_control_percentage_road1, rng=rng,
+                                 placement=placement)
+    cars_road2 = initialize_road(L, N, CELL_WIDTH, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal,
+                                 rng=rng, placement=placement)
 
     highlight_car_road1 = cars_road1[0] if cars_road1 else None
     highlight_car_road2 = cars_road2[0] if cars_road2 else None
@@ -135,18 +137,10 @@ def run_simulation(
     step = 0
 
     # For stop-start frequency tracking
-    prev_velocity_road1 = {}
-    prev_velocity_road2 = {}
-    stop_start_count_road1 = {}
-    stop_start_count_road2 = {}
-
-    for c in cars_road1:
-        prev_velocity_road1[c] = c.velocity
-        stop_start_count_road1[c] = 0
-
-    for c in cars_road2:
-        prev_velocity_road2[c] = c.velocity
-        stop_start_count_road2[c] = 0
+    prev_velocity_road1 = np.array([c.velocity for c in cars_road1], dtype=np.int64)
+    prev_velocity_road2 = np.array([c.velocity for c in cars_road2], dtype=np.int64)
+    stop_start_count_road1 = np.zeros(len(cars_road1), dtype=np.int64)
+    stop_start_count_road2 = np.zeros(len(cars_road2), dtype=np.int64)
 
     enable_flow_delay_plot = False
     enable_cars_stopped_plot = False
@@ -161,209 +155,671 @@ def run_simulation(
         enable_jam_queue_plot=enable_jam_queue_plot
     )
 
-    if not headless:
-        import pygame
-        last_simulation_step_time = pygame.time.get_ticks()
-    else:
-        last_simulation_step_time = 0
+    recorder = SeriesRecorder(steps, record=record, record_every=record_every)
+
+    # Metrics recorded in simulation_data, the ones the enabled live plots show and the
+    # stopped cars of the on-screen text
+    metric_names = RECORDED_METRICS + measurement.live_metrics() + ['stopped']
+    road_metrics_road1 = RoadMetrics(L, vmax, metrics=metric_names)
+    road_metrics_road2 = RoadMetrics(L, vmax, metrics=metric_names)
 
-    queue_duration_road1 = 0
-    queue_duration_road2 = 0
+    last_simulation_step_time = pygame.time.get_ticks()
 
     try:
         while running and step < steps:
-            if not headless:
-                import pygame
-                current_time = pygame.time.get_ticks()
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        running = False
-                    elif event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_SPACE:
-                            paused = not paused
-                        elif event.key == pygame.K_UP:
-                            SIM_STEPS_PER_SECOND += 1
-                            SIMULATION_STEP_INTERVAL = 1000 / SIM_STEPS_PER_SECOND
-                        elif event.key == pygame.K_DOWN:
-                            SIM_STEPS_PER_SECOND = max(1, SIM_STEPS_PER_SECOND - 1)
-                            SIMULATION_STEP_INTERVAL = 1000 / SIM_STEPS_PER_SECOND
-                        elif event.key == pygame.K_g:
-                            DRAW_GRID = not DRAW_GRID
-                        elif event.key == pygame.K_ESCAPE:
-                            running = False
-
-                control_message = measurement.check_control_messages()
-                if control_message == "TERMINATE_FROM_PLOT":
+            current_time = pygame.time.get_ticks()
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
                     running = False
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        paused = not paused
+                    elif event.key == pygame.K_UP:
+                        SIM_STEPS_PER_SECOND += 1
+                        SIMULATION_STEP_INTERVAL = 1000 / SIM_STEPS_PER_SECOND
+                    elif event.key == pygame.K_DOWN:
+                        SIM_STEPS_PER_SECOND = max(1, SIM_STEPS_PER_SECOND - 1)
+                        SIMULATION_STEP_INTERVAL = 1000 / SIM_STEPS_PER_SECOND
+                    elif event.key == pygame.K_g:
+                        DRAW_GRID = not DRAW_GRID
+                    elif event.key == pygame.K_ESCAPE:
+                        running = False
 
-                if paused or (current_time - last_simulation_step_time < SIMULATION_STEP_INTERVAL):
-                    if paused:
-                        clock.tick(FPS)
-                        continue
-                    else:
-                        clock.tick(FPS)
-                        continue
-                else:
-                    last_simulation_step_time = current_time
-
-            # Update Road 1
-            cars_sorted_road1 = sorted(cars_road1, key=lambda c: c.position)
-            for i, car in enumerate(cars_sorted_road1):
-                if i < len(cars_sorted_road1) - 1:
-                    next_car = cars_sorted_road1[i + 1]
-                    distance = next_car.position - car.position - 1
-                    if distance < 0:
-                        distance += L
-                else:
-                    next_car = cars_sorted_road1[0]
-                    distance = (next_car.position + L) - car.position - 1
-                velocity_of_next_car = next_car.velocity
-                car.update_velocity(distance, velocity_of_next_car)
-
-            for car in cars_sorted_road1:
-                car.move()
-
-            # Update Road 2
-            cars_sorted_road2 = sorted(cars_road2, key=lambda c: c.position)
-            for i, car in enumerate(cars_sorted_road2):
-                if i < len(cars_sorted_road2) - 1:
-                    next_car = cars_sorted_road2[i + 1]
-                    distance = next_car.position - car.position - 1
-                    if distance < 0:
-                        distance += L
+            control_message = measurement.check_control_messages()
+            if control_message == "TERMINATE_FROM_PLOT":
+                running = False
+
+            if paused or (current_time - last_simulation_step_time < SIMULATION_STEP_INTERVAL):
+                if paused:
+                    clock.tick(FPS)
+                    continue
                 else:
-                    next_car = cars_sorted_road2[0]
-                    distance = (next_car.position + L) - car.position - 1
-                velocity_of_next_car = next_car.velocity
-                car.update_velocity(distance, velocity_of_next_car)
-
-            for car in cars_sorted_road2:
-                car.move()
-
-            # Compute metrics
-            if cars_road1:
-                average_speed_road1 = np.mean([c.velocity for c in cars_road1])
-                stopped_vehicles_road1 = np.sum([c.velocity == 0 for c in cars_road1])
+                    clock.tick(FPS)
+                    continue
             else:
-                average_speed_road1 = 0
-                stopped_vehicles_road1 = 0
+                last_simulation_step_time = current_time
 
-            if cars_road2:
-                average_speed_road2 = np.mean([c.velocity for c in cars_road2])
-                stopped_vehicles_road2 = np.sum([c.velocity == 0 for c in cars_road2])
-            else:
-                average_speed_road2 = 0
-                stopped_vehicles_road2 = 0
-
-            delay_road1 = (vmax - average_speed_road1) / vmax * 100 if vmax != 0 else 0
-            delay_road2 = (vmax - average_speed_road2) / vmax * 100 if vmax != 0 else 0
-
-            jam_length_road1, queue_duration_road1 = compute_jam_length_and_queue_duration(
-                L, cars_road1, queue_duration_road1)
-            jam_length_road2, queue_duration_road2 = compute_jam_length_and_queue_duration(
-                L, cars_road2, queue_duration_road2)
-
-            simulation_data['time_steps'].append(step)
-            simulation_data['flow_rate_acc'].append(average_speed_road1)
-            simulation_data['flow_rate_no_acc'].append(average_speed_road2)
-            simulation_data['jam_lengths_acc'].append(queue_duration_road1)
-            simulation_data['jam_lengths_no_acc'].append(queue_duration_road2)
-            simulation_data['fraction_stopped_road1'].append(stopped_vehicles_road1 / N)
-            simulation_data['fraction_stopped_road2'].append(stopped_vehicles_road2 / N)
-            simulation_data['delay_acc'].append(delay_road1)
-            simulation_data['delay_no_acc'].append(delay_road2)
+            step_cars(cars_road1, L)
+            step_cars(cars_road2, L)
+
+            # Compute metrics (one pass over each road)
+            velocity_road1 = np.array([c.velocity for c in cars_road1], dtype=np.int64)
+            velocity_road2 = np.array([c.velocity for c in cars_road2], dtype=np.int64)
+            metrics_road1 = road_metrics_road1.compute(velocity_road1, [c.position for c in cars_road1])
+            metrics_road2 = road_metrics_road2.compute(velocity_road2, [c.position for c in cars_road2])
+
+            recorder.record_metrics(step, metrics_road1, metrics_road2)
 
             # Track stop-start transitions
-            for car in cars_road1:
-                if (prev_velocity_road1[car] == 0 and car.velocity > 0) or (
-                        prev_velocity_road1[car] > 0 and car.velocity == 0):
-                    stop_start_count_road1[car] += 1
-                prev_velocity_road1[car] = car.velocity
+            stop_start_count_road1 += _stop_start_transitions(prev_velocity_road1, velocity_road1)
+            stop_start_count_road2 += _stop_start_transitions(prev_velocity_road2, velocity_road2)
+            prev_velocity_road1 = velocity_road1
+            prev_velocity_road2 = velocity_road2
 
-            for car in cars_road2:
-                if (prev_velocity_road2[car] == 0 and car.velocity > 0) or (
-                        prev_velocity_road2[car] > 0 and car.velocity == 0):
-                    stop_start_count_road2[car] += 1
-                prev_velocity_road2[car] = car.velocity
-
-            measurement.update_flow_delay_metrics(step, average_speed_road1, average_speed_road2, delay_road1,
-                                                  delay_road2)
-            measurement.update_cars_stopped_metrics(step, stopped_vehicles_road1, stopped_vehicles_road2)
-
-            # Compute metrics again after updating
-            average_speed_road1 = np.mean([c.velocity for c in cars_road1]) if cars_road1 else 0
-            stopped_vehicles_road1 = sum(c.velocity == 0 for c in cars_road1)
-            average_speed_road2 = np.mean([c.velocity for c in cars_road2]) if cars_road2 else 0
-            stopped_vehicles_road2 = sum(c.velocity == 0 for c in cars_road2)
-
-            delay_road1 = (vmax - average_speed_road1) / vmax * 100 if vmax != 0 else 0
-            delay_road2 = (vmax - average_speed_road2) / vmax * 100 if vmax != 0 else 0
-
-            jam_length_road1, queue_duration_road1 = compute_jam_length_and_queue_duration(
-                L, cars_road1, queue_duration_road1)
-            jam_length_road2, queue_duration_road2 = compute_jam_length_and_queue_duration(
-                L, cars_road2, queue_duration_road2)
-
-            measurement.update_flow_delay_metrics(step, average_speed_road1, average_speed_road2, delay_road1,
-                                                  delay_road2)
-            measurement.update_cars_stopped_metrics(step, stopped_vehicles_road1, stopped_vehicles_road2)
-
-            # Update density/occupancy
-            density_r1 = len(cars_road1) / L
-            occupancy_r1_val = (len(set(c.position for c in cars_road1)) / L) * 100
-            density_r2 = len(cars_road2) / L
-            occupancy_r2_val = (len(set(c.position for c in cars_road2)) / L) * 100
-            measurement.update_density_occupancy(step, density_r1, occupancy_r1_val, density_r2, occupancy_r2_val)
-
-            # Update jam/queue
-            measurement.update_jam_queue_metrics(step, jam_length_road1, jam_length_road2, queue_duration_road1,
-                                                 queue_duration_road2)
+            measurement.update_metrics(step, metrics_road1, metrics_road2)
 
             step += 1
 
-            if not headless:
-                screen.fill(WHITE)
-                import pygame
-                pygame.draw.line(screen, BLACK, (0, ROAD_Y_TOP), (2500, ROAD_Y_TOP), 2)
-                pygame.draw.line(screen, BLACK, (0, ROAD_Y_BOTTOM), (2500, ROAD_Y_BOTTOM), 2)
-                draw_grid(screen, ROAD_Y_TOP, L, CELL_WIDTH, WINDOW_HEIGHT=800, DRAW_GRID=DRAW_GRID)
-                draw_grid(screen, ROAD_Y_BOTTOM, L, CELL_WIDTH, WINDOW_HEIGHT=800, DRAW_GRID=DRAW_GRID)
-
-                for car in cars_road1:
-                    car.draw(screen, ROAD_Y_TOP, CAR_HEIGHT, highlight=(car == highlight_car_road1))
-                for car in cars_road2:
-                    car.draw(screen, ROAD_Y_BOTTOM, CAR_HEIGHT, highlight=(car == highlight_car_road2))
-
-                # Dynamic Text Rendering
-                road1_text = f"Road 1 - {N_ACC_CARS} ACC Cars - Step: {step} | Density: {rho:.2f} | Avg Speed: {average_speed_road1:.2f} | Stopped: {stopped_vehicles_road1}"
-                road1_surface = font.render(road1_text, True, DODGERBLUE)
-                screen.blit(road1_surface, (20, 20))
-
-                road2_text = f"Road 2 - {N} Human Drivers (No ACC) - Step: {step} | Density: {rho:.2f} | Avg Speed: {average_speed_road2:.2f} | Stopped: {stopped_vehicles_road2}"
-                road2_surface = font.render(road2_text, True, SALMON)
-                road2_text_x = 20
-                road2_text_y = ROAD_Y_TOP + (ROAD_Y_BOTTOM - ROAD_Y_TOP) // 2
-                screen.blit(road2_surface, (road2_text_x, road2_text_y))
-
-                pygame.display.flip()
-                clock.tick(FPS)
+            screen.fill(WHITE)
+            pygame.draw.line(screen, BLACK, (0, ROAD_Y_TOP), (2500, ROAD_Y_TOP), 2)
+            pygame.draw.line(screen, BLACK, (0, ROAD_Y_BOTTOM), (2500, ROAD_Y_BOTTOM), 2)
+            draw_grid(screen, ROAD_Y_TOP, L, CELL_WIDTH, WINDOW_HEIGHT=800, DRAW_GRID=DRAW_GRID)
+            draw_grid(screen, ROAD_Y_BOTTOM, L, CELL_WIDTH, WINDOW_HEIGHT=800, DRAW_GRID=DRAW_GRID)
+
+            for car in cars_road1:
+                car.draw(screen, ROAD_Y_TOP, CAR_HEIGHT, highlight=(car == highlight_car_road1))
+            for car in cars_road2:
+                car.draw(screen, ROAD_Y_BOTTOM, CAR_HEIGHT, highlight=(car == highlight_car_road2))
+
+            # Dynamic Text Rendering
+            average_speed_road1 = metrics_road1['average_speed'][0]
+            stopped_vehicles_road1 = metrics_road1['stopped'][0]
+            average_speed_road2 = metrics_road2['average_speed'][0]
+            stopped_vehicles_road2 = metrics_road2['stopped'][0]
+            road1_text = f"Road 1 - {N_ACC_CARS} ACC Cars - Step: {step} | Density: {rho:.2f} | Avg Speed: {average_speed_road1:.2f} | Stopped: {stopped_vehicles_road1}"
+            road1_surface = font.render(road1_text, True, DODGERBLUE)
+            screen.blit(road1_surface, (20, 20))
+
+            road2_text = f"Road 2 - {N} Human Drivers (No ACC) - Step: {step} | Density: {rho:.2f} | Avg Speed: {average_speed_road2:.2f} | Stopped: {stopped_vehicles_road2}"
+            road2_surface = font.render(road2_text, True, SALMON)
+            road2_text_x = 20
+            road2_text_y = ROAD_Y_TOP + (ROAD_Y_BOTTOM - ROAD_Y_TOP) // 2
+            screen.blit(road2_surface, (road2_text_x, road2_text_y))
+
+            pygame.display.flip()
+            clock.tick(FPS)
 
     except KeyboardInterrupt:
         running = False
         print("\nKeyboard Interrupt detected. Exiting...")
     finally:
-        if not headless:
-            measurement.close_plots()
-            import pygame
-            pygame.quit()
+        measurement.close_plots()
+        pygame.quit()
 
-        # Store stop-start frequency data in simulation_data
-        simulation_data['stop_start_acc'] = [stop_start_count_road1[c] for c in cars_road1]
-        simulation_data['stop_start_no_acc'] = [stop_start_count_road2[c] for c in cars_road2]
+        # Store the recorded steps (fewer than steps on early exit) and stop-start frequency data
+        recorder.fill(simulation_data)
+        simulation_data['stop_start_acc'] = stop_start_count_road1.tolist()
+        simulation_data['stop_start_no_acc'] = stop_start_count_road2.tolist()
 
         return cars_road1, cars_road2, simulation_data
 
 
+def run_simulation_headless(L, N, vmax, p_fault, p_slow, steps, prob_faster, prob_slower, prob_normal,
+                            cruise_control_percentage_road1=100, seed=None, engine="vectorized",
+                            record="full", record_every=1, roads="both", placement="random", trajectory=None,
+                            trajectory_format="memmap"):
+    """
+    Headless run of the simulation, recording the steps that iter_simulation yields.
+
+    Cars are created exactly like in run_simulation, so the initial state is the same for a
+    given seed. Returns the same (cars_road1, cars_road2, simulation_data) tuple, with
+    the Car objects holding the final state of the run. A road that is not simulated
+    has None instead of cars, and its keys are left out of simulation_data.
+
+    Parameters:
+        seed (int or np.random.SeedSequence, optional): Seed of the run; fresh entropy if None.
+        engine (str, optional): "cars" (Car objects) or "vectorized" (VectorizedRoad).
+        record (str, optional): "full" per-step series or "summary" statistics only (see SeriesRecorder).
+        record_every (int, optional): Record every record_every-th step. Defaults to 1.
+        roads (str, optional): Roads to simulate and record, a key of ROAD_SELECTIONS.
+        placement (str, optional): Initial placement of the cars (see placement.place_cars).
+        trajectory (str, optional): Directory to record the positions and velocities of the cars
+            into, at the recorded steps (see start_trajectories). Not recorded if None.
+        trajectory_format (str, optional): Format of the trajectory, a key of TRAJECTORY_FORMATS.
+    """
+    cars_road1, cars_road2, snapshots = start_simulation(
+        L, N, vmax, p_fault, p_slow, steps, prob_faster, prob_slower, prob_normal,
+        cruise_control_percentage_road1=cruise_control_percentage_road1, seed=seed, engine=engine,
+        every=record_every, roads=roads, placement=placement)
+    recorder = SeriesRecorder(steps, record=record, record_every=record_every, roads=ROAD_SELECTIONS[roads])
+    simulation_data = new_simulation_data(L, N, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal)
+
+    shapes = [(1, N) if cars is not None else None for cars in (cars_road1, cars_road2)]
+    trajectories = start_trajectories(trajectory, steps, L, record_every, *shapes,
+                                      trajectory_format=trajectory_format)
+    stop_start_road1, stop_start_road2 = record_snapshots(snapshots, recorder, *shapes, trajectories=trajectories)
+    fill_simulation_data(simulation_data, recorder, stop_start_road1, stop_start_road2, replica=0)
+
+    return cars_road1, cars_road2, simulation_data
+
+
+def iter_simulation(
+    L=120,               # Road length
+    N=60,                # Number of cars per road
+    vmax=4,              # Maximum speed
+    p_fault=0.1,         # Probability of random slowdown
+    p_slow=0.5,          # Probability of slow-to-start behavior
+    steps=1000,          # Number of steps, None to run until the consumer stops
+    prob_faster=0.70,    # Probability that a driver is faster
+    prob_slower=0.10,    # Probability that a driver is slower
+    prob_normal=0.20,    # Probability that a driver is normal
+    engine="vectorized", # "cars" or "vectorized"
+    seed=None,           # int or np.random.SeedSequence of the run; fresh entropy if None
+    every=1,             # Yield a snapshot every `every` steps
+    cruise_control_percentage_road1=100,
+    roads="both",        # Roads to simulate: "both", "acc" (road 1) or "human" (road 2)
+    placement="random"   # Initial placement: "random", "homogeneous" or "megajam"
+):
+    """
+    Run a headless simulation step by step, yielding a snapshot every `every` steps.
+
+    The run is the one run_simulation(headless=True) makes for the same seed and engine, but
+    nothing is stored: consumers keep what they need and can stop at any step. Snapshots
+    are dictionaries with
+        'step': index of the step (0 for the state after the first step).
+        'metrics_road1', 'metrics_road2': RoadMetrics results of RECORDED_METRICS, one value per replica.
+        'position_road1', 'velocity_road1', 'active_road1' (and the same for road 2): (1 x cars) arrays.
+        'stop_start_road1', 'stop_start_road2': stop-start transitions of every car so far.
+
+    The arrays are the live state of the run and change with the next step; copy them to keep them.
+    Snapshots only have the keys of the simulated roads.
+    """
+    _, _, snapshots = start_simulation(L, N, vmax, p_fault, p_slow, steps, prob_faster, prob_slower, prob_normal,
+                                       cruise_control_percentage_road1=cruise_control_percentage_road1,
+                                       seed=seed, engine=engine, every=every, roads=roads, placement=placement)
+    yield from snapshots
+
+
+def start_simulation(L, N, vmax, p_fault, p_slow, steps, prob_faster, prob_slower, prob_normal,
+                     cruise_control_percentage_road1=100, seed=None, engine="vectorized", every=1, roads="both",
+                     placement="random"):
+    """
+    Create the cars of a headless run and the generator of its snapshots (see iter_simulation).
+
+    The cars of both roads are always placed, so a road starts the same whichever roads are
+    simulated. With the array engines the random numbers of both roads are drawn as well,
+    so a single-road run gives the same results as that road in a run of both; with the
+    "cars" engine the cars share one generator and only the initial state is the same.
+    With the array engines, the Car objects get the state of the roads when the generator
+    finishes or is closed.
+
+    Returns:
+        tuple: (cars_road1, cars_road2, snapshots) with None for a road that is not simulated.
+    """
+    check_driver_probabilities(prob_faster, prob_slower, prob_normal)
+    if engine != "cars" and engine not in ROAD_ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    if roads not in ROAD_SELECTIONS:
+        raise ValueError(f"Unknown road selection: {roads}")
+
+    rng = np.random.default_rng(seed)
+    cars = [initialize_road(L, N, 1, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal,
+                            cruise_control_percentage=cruise_control_percentage_road1, rng=rng,
+                            placement=placement),
+            initialize_road(L, N, 1, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal, rng=rng,
+                            placement=placement)]
+    cars = [road_cars if index in ROAD_SELECTIONS[roads] else None for index, road_cars in enumerate(cars)]
+    cars_road1, cars_road2 = cars
+
+    if engine == "cars":
+        return cars_road1, cars_road2, iter_cars(cars_road1, cars_road2, L, vmax, steps, every)
+
+    road_class = ROAD_ENGINES[engine]
+    road1, road2 = [road_class.from_cars(road_cars, L, vmax, p_fault, p_slow) if road_cars is not None else None
+                    for road_cars in cars]
+    random_values = UniformBlocks([rng], [N, N], [(1, N), (1, N)])
+
+    def snapshots():
+        try:
+            yield from iter_roads(road1, road2, steps, vmax, draw_random_values=random_values.next, every=every)
+        finally:
+            for road, road_cars in zip((road1, road2), cars):
+                if road is not None:
+                    road.sync_cars(road_cars)
+
+    return cars_road1, cars_road2, snapshots()
+
+
+def run_simulation_replicas(
+    L=120,               # Road length
+    N=60,                # Number of cars per road, scalar or one value per replica
+    vmax=4,              # Maximum speed
+    p_fault=0.1,         # Probability of random slowdown, scalar or one value per replica
+    p_slow=0.5,          # Probability of slow-to-start behavior, scalar or one value per replica
+    steps=1000,          # Number of steps
+    prob_faster=0.70,    # Probability that a driver is faster
+    prob_slower=0.10,    # Probability that a driver is slower
+    prob_normal=0.20,    # Probability that a driver is normal
+    seeds=(0,),          # One seed per replica
+    cruise_control_percentage_road1=100,
+    engine="vectorized", # Array engine (key of ROAD_ENGINES)
+    record="full",       # "full" per-step series or "summary" statistics only
+    record_every=1,      # Record every record_every-th step
+    roads="both",        # Roads to simulate: "both", "acc" (road 1) or "human" (road 2)
+    placement="random",  # Initial placement: "random", "homogeneous" or "megajam"
+    trajectory=None,     # Directory to record the cars' positions and velocities into
+    trajectory_format="memmap"  # "memmap" or "keyframe" (compressed)
+):
+    """
+    Run len(seeds) independent headless replicas at once as (replicas x cars) arrays.
+
+    Each replica draws its initial state and random numbers from its own generator,
+    seeded with its entry in seeds, so a replica gives the same result whatever
+    other replicas it is batched with. Replicas with fewer cars are padded and masked.
+    A road that is not simulated still draws its numbers, so it does not change the other road.
+
+    Returns:
+        tuple: (road1, road2, simulation_data_list) with the final VectorizedRoad state
+            of both roads (None if not simulated) and one simulation_data dictionary per replica.
+    """
+    check_driver_probabilities(prob_faster, prob_slower, prob_normal)
+
+    replicas = len(seeds)
+    N = np.broadcast_to(np.asarray(N, dtype=np.int64), (replicas,))
+    p_fault = np.broadcast_to(np.asarray(p_fault, dtype=np.float64), (replicas,))
+    p_slow = np.broadcast_to(np.asarray(p_slow, dtype=np.float64), (replicas,))
+
+    if engine not in ROAD_ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    if roads not in ROAD_SELECTIONS:
+        raise ValueError(f"Unknown road selection: {roads}")
+    road_class = ROAD_ENGINES[engine]
+    rngs = [np.random.default_rng(seed) for seed in seeds]
+    road1 = road_class.from_rngs(rngs, L, N, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal,
+                                 cruise_control_percentage=cruise_control_percentage_road1, placement=placement)
+    road2 = road_class.from_rngs(rngs, L, N, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal,
+                                 placement=placement)
+
+    # Only the slots of real cars consume numbers, so a replica's stream does not
+    # depend on how much it is padded.
+    random_values = UniformBlocks(rngs, [N, N], [road1.shape, road2.shape])
+
+    road1 = road1 if 0 in ROAD_SELECTIONS[roads] else None
+    road2 = road2 if 1 in ROAD_SELECTIONS[roads] else None
+    recorder, stop_start_road1, stop_start_road2 = simulate_vectorized_roads(
+        road1, road2, steps, vmax, draw_random_values=random_values.next, record=record, record_every=record_every,
+        trajectory=trajectory, trajectory_format=trajectory_format)
+
+    simulation_data_list = []
+    for r in range(replicas):
+        simulation_data = new_simulation_data(L, int(N[r]), vmax, float(p_fault[r]), float(p_slow[r]),
+                                              prob_faster, prob_slower, prob_normal)
+        fill_simulation_data(simulation_data, recorder, stop_start_road1, stop_start_road2, replica=r)
+        simulation_data_list.append(simulation_data)
+
+    return road1, road2, simulation_data_list
+
+
+def run_road_configs(
+    road_configs,        # One dict per road, overriding ROAD_CONFIG_DEFAULTS
+    L=120,               # Road length
+    steps=1000,          # Number of steps
+    seeds=0,             # One seed per road, or one seed for every road
+    engine="vectorized", # Array engine (key of ROAD_ENGINES)
+    record="full",       # "full" per-step series or "summary" statistics only
+    record_every=1,      # Record every record_every-th step
+    placement="random",  # Initial placement: "random", "homogeneous" or "megajam"
+    trajectory=None,     # Directory to record the cars' positions and velocities into (as road1)
+    trajectory_format="memmap"  # "memmap" or "keyframe" (compressed)
+):
+    """
+    Run differently configured roads together, as the replicas of one batched road.
+
+    Every road has its own number of cars, maximum speed, fault and slow-to-start
+    probabilities, driver mix and percentage of ACC cars, so a whole penetration curve
+    ([{'cruise_control_percentage': p} for p in range(0, 101, 10)]) takes one run. Roads
+    are placed and driven like road 1 of run_simulation and recorded under its keys of
+    simulation_data (flow_rate_acc, jam_lengths_acc, fraction_stopped_road1, delay_acc,
+    stop_start_acc). Roads with the same seed and number of cars start with the same
+    positions and drivers and draw the same random numbers, so differences between them
+    come from their configurations.
+
+    Returns:
+        tuple: (road, simulation_data_list) with the final state of the batched road and
+            one simulation_data dictionary per road configuration.
+    """
+    configs = [{**ROAD_CONFIG_DEFAULTS, **config} for config in road_configs]
+    unknown = {name for config in road_configs for name in config} - set(ROAD_CONFIG_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown road parameters: {sorted(unknown)}")
+    if engine not in ROAD_ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+
+    if seeds is None or isinstance(seeds, (int, np.integer, np.random.SeedSequence)):
+        seeds = [seeds] * len(configs)
+    elif len(seeds) != len(configs):
+        raise ValueError("seeds must have one seed per road configuration.")
+    rngs = [np.random.default_rng(seed) for seed in seeds]
+
+    column = {name: np.array([config[name] for config in configs]) for name in ROAD_CONFIG_DEFAULTS}
+    road = ROAD_ENGINES[engine].from_rngs(
+        rngs, L, column['N'], column['vmax'], column['p_fault'], column['p_slow'],
+        column['prob_faster'], column['prob_slower'], column['prob_normal'],
+        cruise_control_percentage=column['cruise_control_percentage'], placement=placement)
+    random_values = UniformBlocks(rngs, [column['N']], [road.shape])
+
+    recorder, stop_start, _ = simulate_vectorized_roads(
+        road, None, steps, column['vmax'], draw_random_values=random_values.next,
+        record=record, record_every=record_every, trajectory=trajectory, trajectory_format=trajectory_format)
+
+    simulation_data_list = []
+    for r, config in enumerate(configs):
+        simulation_data = new_simulation_data(L, config['N'], config['vmax'], config['p_fault'], config['p_slow'],
+                                              config['prob_faster'], config['prob_slower'], config['prob_normal'])
+        simulation_data['cruise_control_percentage'] = config['cruise_control_percentage']
+        fill_simulation_data(simulation_data, recorder, stop_start, None, replica=r)
+        simulation_data_list.append(simulation_data)
+
+    return road, simulation_data_list
+
+
+def simulate_vectorized_roads(road1, road2, steps, vmax, draw_random_values=None, record="full", record_every=1,
+                              trajectory=None, trajectory_format="memmap"):
+    """
+    Step two VectorizedRoads together and record the per-step metrics of every replica.
+
+    Parameters:
+        road1 (VectorizedRoad): Road 1 (ACC) replicas, None to simulate road 2 only.
+        road2 (VectorizedRoad): Road 2 (human drivers) replicas, same number of replicas as road1,
+            None to simulate road 1 only.
+        steps (int): Number of steps.
+        vmax (int or array-like): Maximum speed, used for the delay, per replica.
+        draw_random_values (callable, optional): Returns the (road1, road2) uniform arrays for one
+            step. Each road draws from its own generator if None.
+        record (str, optional): "full" per-step series or "summary" statistics only (see SeriesRecorder).
+        record_every (int, optional): Record every record_every-th step. Defaults to 1.
+        trajectory (str, optional): Directory to record the positions and velocities of the cars
+            into (see start_trajectories). Not recorded if None.
+        trajectory_format (str, optional): Format of the trajectory, a key of TRAJECTORY_FORMATS.
+
+    Returns:
+        tuple: (recorder, stop_start_road1, stop_start_road2) with the SeriesRecorder of the run.
+    """
+    roads = [index for index, road in enumerate((road1, road2)) if road is not None]
+    first_road = next(road for road in (road1, road2) if road is not None)
+    replicas = first_road.shape[0]
+    recorder = SeriesRecorder(steps, replicas, record=record, record_every=record_every, roads=roads)
+    snapshots = iter_roads(road1, road2, steps, vmax, draw_random_values=draw_random_values, every=record_every)
+    shapes = [road.shape if road is not None else None for road in (road1, road2)]
+    trajectories = start_trajectories(trajectory, steps, first_road.road_length, record_every, *shapes,
+                                      trajectory_format=trajectory_format)
+    stop_start_road1, stop_start_road2 = record_snapshots(snapshots, recorder, *shapes, trajectories=trajectories)
+    return recorder, stop_start_road1, stop_start_road2
+
+
+def record_snapshots(snapshots, recorder, shape_road1, shape_road2, trajectories=None):
+    """
+    Record the metrics of every snapshot with a SeriesRecorder.
+
+    Parameters:
+        snapshots (iterator): Snapshots of the run, as yielded by iter_simulation or iter_roads.
+        recorder (SeriesRecorder): Recorder of the run.
+        shape_road1 (tuple): (replicas, cars) shape of road 1, None if it is not simulated.
+        shape_road2 (tuple): (replicas, cars) shape of road 2, None if it is not simulated.
+        trajectories (dict, optional): Road number (1 or 2) -> TrajectoryRecorder that records
+            the cars of the road in every snapshot; closed at the end of the run.
+
+    Returns:
+        tuple: (stop_start_road1, stop_start_road2) stop-start transitions of every car,
+            None for a road that is not simulated.
+    """
+    stop_start_road1, stop_start_road2 = [np.zeros(shape, dtype=np.int64) if shape is not None else None
+                                          for shape in (shape_road1, shape_road2)]
+
+    try:
+        for snapshot in snapshots:
+            recorder.record_metrics(snapshot['step'], snapshot.get('metrics_road1'), snapshot.get('metrics_road2'))
+            for road, trajectory in (trajectories or {}).items():
+                trajectory.record(snapshot['step'], snapshot[f'position_road{road}'],
+                                  snapshot[f'velocity_road{road}'], snapshot[f'active_road{road}'])
+            stop_start_road1 = snapshot.get('stop_start_road1')
+            stop_start_road2 = snapshot.get('stop_start_road2')
+
+    except KeyboardInterrupt:
+        print("\nKeyboard Interrupt detected. Exiting...")
+    finally:
+        snapshots.close()
+        for trajectory in (trajectories or {}).values():
+            trajectory.close()
+
+    return stop_start_road1, stop_start_road2
+
+
+def start_trajectories(trajectory, steps, L, every, shape_road1, shape_road2, trajectory_format="memmap"):
+    """
+    Trajectory recorders of the simulated roads, in the road1 and road2 subdirectories of trajectory.
+
+    Returns:
+        dict: Road number (1 or 2) -> recorder of TRAJECTORY_FORMATS, empty if trajectory is None.
+    """
+    if trajectory is None:
+        return {}
+    if trajectory_format not in TRAJECTORY_FORMATS:
+        raise ValueError(f"Unknown trajectory format: {trajectory_format}")
+    recorder_class = TRAJECTORY_FORMATS[trajectory_format]
+    return {road: recorder_class(os.path.join(trajectory, f"road{road}"), steps, shape, L, every=every)
+            for road, shape in ((1, shape_road1), (2, shape_road2)) if shape is not None}
+
+
+def iter_roads(road1, road2, steps, vmax, draw_random_values=None, every=1):
+    """
+    Step two VectorizedRoads together, yielding a snapshot of every replica every `every`
+    steps (see iter_simulation).
+
+    Parameters:
+        road1 (VectorizedRoad): Road 1 (ACC) replicas, None to simulate road 2 only.
+        road2 (VectorizedRoad): Road 2 (human drivers) replicas, same number of replicas as road1,
+            None to simulate road 1 only.
+        steps (int): Number of steps, None to run until the consumer stops.
+        vmax (int or array-like): Maximum speed, used for the delay, per replica.
+        draw_random_values (callable, optional): Returns the (road1, road2) uniform arrays for one
+            step. Each road draws from its own generator if None.
+        every (int, optional): Steps between snapshots. Defaults to 1.
+    """
+    roads = [(index, road) for index, road in enumerate((road1, road2)) if road is not None]
+
+    def advance():
+        random_values = (None, None) if draw_random_values is None else draw_random_values()
+        for index, road in roads:
+            road.step(random_values[index])
+
+    def state():
+        return [(road.velocity, road.position, road.active) for _, road in roads]
+
+    return _iter_snapshots(advance, state, [index for index, _ in roads], roads[0][1].road_length, vmax, steps, every)
+
+
+def iter_cars(cars_road1, cars_road2, L, vmax, steps, every=1):
+    """
+    Step the Car objects of both roads, yielding a snapshot every `every` steps (see iter_simulation).
+    A road with None instead of cars is not simulated.
+    """
+    roads = [(index, cars) for index, cars in enumerate((cars_road1, cars_road2)) if cars is not None]
+
+    def advance():
+        for _, cars in roads:
+            step_cars(cars, L)
+
+    def state():
+        road_state = []
+        for _, cars in roads:
+            velocity = np.array([car.velocity for car in cars], dtype=np.int64).reshape(1, -1)
+            position = np.array([car.position for car in cars], dtype=np.int64).reshape(1, -1)
+            road_state.append((velocity, position, np.ones(velocity.shape, dtype=bool)))
+        return road_state
+
+    return _iter_snapshots(advance, state, [index for index, _ in roads], L, vmax, steps, every)
+
+
+def _iter_snapshots(advance, state, roads, L, vmax, steps, every):
+    """
+    Generator behind iter_roads and iter_cars.
+
+    Parameters:
+        advance (callable): Moves the simulated roads by one step.
+        state (callable): Returns the (velocity, position, active) arrays of the simulated roads,
+            each of shape (replicas, cars).
+        roads (list[int]): Index of every simulated road (0 for road 1, 1 for road 2).
+    """
+    road_state = state()
+    replicas = road_state[0][0].shape[0]
+    road_metrics = [RoadMetrics(L, vmax, replicas, metrics=RECORDED_METRICS) for _ in road_state]
+    prev_velocity = [velocity.copy() for velocity, _, _ in road_state]
+    stop_start = [np.zeros(velocity.shape, dtype=np.int64) for velocity in prev_velocity]
+    step = 0
+
+    while steps is None or step < steps:
+        advance()
+        road_state = state()
+
+        # The metrics and stop-start counts need every step, snapshots or not
+        metrics = [road_metric.compute(velocity, position, active)
+                   for road_metric, (velocity, position, active) in zip(road_metrics, road_state)]
+        for k, (velocity, _, _) in enumerate(road_state):
+            stop_start[k] += _stop_start_transitions(prev_velocity[k], velocity)
+            prev_velocity[k] = velocity
+
+        if step % every == 0:
+            snapshot = {'step': step}
+            for k, (index, (velocity, position, active)) in enumerate(zip(roads, road_state)):
+                road = index + 1
+                snapshot[f'metrics_road{road}'] = metrics[k]
+                snapshot[f'position_road{road}'] = position
+                snapshot[f'velocity_road{road}'] = velocity
+                snapshot[f'active_road{road}'] = active
+                snapshot[f'stop_start_road{road}'] = stop_start[k]
+            yield snapshot
+
+        step += 1
+
+
+def check_driver_probabilities(prob_faster, prob_slower, prob_normal):
+    """
+    Raise a ValueError unless the driver probabilities sum to 1.
+    """
+    if not np.isclose(prob_faster + prob_slower + prob_normal, 1.0):
+        raise ValueError("prob_faster, prob_slower, and prob_normal must sum to 1.")
+
+
+def step_cars(cars, L):
+    """
+    Advance the Car objects of one road by one step: update the velocities in road order, then move.
+    """
+    cars_sorted = sorted(cars, key=lambda c: c.position)
+    for i, car in enumerate(cars_sorted):
+        if i < len(cars_sorted) - 1:
+            next_car = cars_sorted[i + 1]
+            distance = next_car.position - car.position - 1
+            if distance < 0:
+                distance += L
+        else:
+            next_car = cars_sorted[0]
+            distance = (next_car.position + L) - car.position - 1
+        velocity_of_next_car = next_car.velocity
+        car.update_velocity(distance, velocity_of_next_car)
+
+    for car in cars_sorted:
+        car.move()
+
+
+def simulation_data_as_lists(simulation_data):
+    """
+    Copy of simulation_data with the per-step series as Python lists, like older versions returned.
+    """
+    return {key: value.tolist() if key in SERIES_DTYPES else value for key, value in simulation_data.items()}
+
+
+def fill_simulation_data(simulation_data, recorder, stop_start_road1, stop_start_road2, replica):
+    """
+    Copy one replica of the recording and the stop-start counts into a simulation_data dictionary.
+    The stop-start counts of a road that was not simulated (None) are left out.
+    """
+    recorder.fill(simulation_data, replica)
+    n_cars = simulation_data['N']
+    for key, stop_start in (('stop_start_acc', stop_start_road1), ('stop_start_no_acc', stop_start_road2)):
+        if stop_start is not None:
+            simulation_data[key] = stop_start[replica, :n_cars].tolist()
+
+
+def _stop_start_transitions(prev_velocity, velocity):
+    """
+    1 where a car went from standing to moving or from moving to standing, else 0.
+
+    Unlike a plain XOR of the v == 0 masks, a change between 0 and -1 (the backward
+    move of rule 2) is not counted, as in the original per-car bookkeeping.
+    """
+    return ((prev_velocity == 0) & (velocity > 0)) | ((prev_velocity > 0) & (velocity == 0))
+
+
+def new_simulation_data(L, N, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal):
+    """
+    Create the simulation_data dictionary with empty per-step series and the run parameters.
+    """
+    rho = N / (L / 2.0)  # rho = N / (L/2) = 2N/L
+    return {
+        **{key: np.zeros(0, dtype=dtype) for key, dtype in SERIES_DTYPES.items()},
+        'prob_faster': prob_faster,
+        'prob_slower': prob_slower,
+        'prob_normal': prob_normal,
+        'p_fault': p_fault,
+        'p_slow': p_slow,
+        'N': N,
+        'L': L,
+        'vmax': vmax,
+        'rho': rho
+    }
+
+
+def initialize_road(L, N, cell_width, vmax, p_fault, p_slow, prob_faster, prob_slower, prob_normal,
+                    cruise_control_percentage=None, rng=None, placement="random"):
+    """
+    Place N cars on distinct cells of a road of length L.
+
+    Parameters:
+        cruise_control_percentage (float, optional): Percentage of cars with ACC.
+            If None, no car uses ACC and no random number is drawn for it.
+        rng (np.random.Generator, optional): Random generator of the run, shared with the cars.
+            A freshly seeded one if None.
+        placement (str, optional): Initial placement of the cars (see placement.place_cars).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    positions = place_cars(rng, L, N, placement)
+    velocity = PLACEMENT_VELOCITIES.get(placement, 2)  # 2 is the default of Car
+    cars = []
+    for position in positions:
+        if cruise_control_percentage is not None:
+            acc_enabled = (rng.random() < (cruise_control_percentage / 100))
+        else:
+            acc_enabled = False
+        car = Car(
+            road_length=L,
+            cell_width=cell_width,
+            max_speed=vmax,
+            p_fault=p_fault,
+            p_slow=p_slow,
+            prob_faster=prob_faster,
+            prob_slower=prob_slower,
+            prob_normal=prob_normal,
+            position=int(position),
+            velocity=velocity,
+            adaptive_cruise_control=acc_enabled,
+            rng=rng
+        )
+        cars.append(car)
+    return cars
+
+
 def draw_grid(screen, road_y, L, CELL_WIDTH, WINDOW_HEIGHT, DRAW_GRID):
     if DRAW_GRID:
         for i in range(L + 1):
@@ -375,35 +831,9 @@ def draw_grid(screen, road_y, L, CELL_WIDTH, WINDOW_HEIGHT, DRAW_GRID):
 
 
 def compute_jam_length_and_queue_duration(road_length, cars, previous_queue_duration):
-    stopped = np.zeros(road_length, dtype=bool)
-    for car in cars:
-        if car.velocity == 0:
-            stopped[car.position] = True
-
-    max_run = 0
-    current_run = 0
-    for i in range(road_length):
-        if stopped[i]:
-            current_run += 1
-            if current_run > max_run:
-                max_run = current_run
-        else:
-            current_run = 0
-
-    # Check wrap-around
-    if stopped[0] and stopped[-1]:
-        start_run = 0
-        i = 0
-        while i < road_length and stopped[i]:
-            start_run += 1
-            i += 1
-        end_run = 0
-        i = road_length - 1
-        while i >= 0 and stopped[i]:
-            end_run += 1
-            i -= 1
-        if start_run + end_run > max_run:
-            max_run = start_run + end_run
+    positions = np.array([car.position for car in cars], dtype=np.int64)
+    stopped = np.array([car.velocity == 0 for car in cars], dtype=bool)
+    max_run, _ = jam_runs(stopped_cells(road_length, positions, stopped), sizes=False)
 
     # Queue duration logic
     if max_run > 0:
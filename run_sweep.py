@@ -0,0 +1,299 @@
+# run_sweep.py
+import itertools
+import multiprocessing
+
+import numpy as np
+
+from ResultCache import ResultCache, run_key
+from SweepStore import SweepStore
+from run_simulation import ROAD_SELECTIONS, run_simulation_replicas
+
+# Parameters of a sweep (fixed or on the grid) and their defaults (those of run_simulation_replicas);
+# 'rho' may replace 'N' (fixed or on the grid), with N = int(rho * (L / 2)) as in the plot scripts
+SWEEP_PARAMETERS = {
+    'L': 120,
+    'N': 60,
+    'vmax': 4,
+    'p_fault': 0.1,
+    'p_slow': 0.5,
+    'steps': 1000,
+    'prob_faster': 0.70,
+    'prob_slower': 0.10,
+    'prob_normal': 0.20,
+    'cruise_control_percentage_road1': 100,
+    'engine': "vectorized",
+    'record_every': 1,
+    'roads': "both",
+    'placement': "random",
+}
+
+# Parameters that may differ between the replicas of one run_simulation_replicas call: grid points
+# that share all other parameters run batched together, spreading the per-step cost over their cars
+BATCHED_PARAMETERS = ('N', 'p_fault', 'p_slow')
+
+# Most car slots per road (replicas x cars) in one batch of grid points
+SWEEP_BATCH_SLOTS = 4096
+
+# Rows a sweep buffers before appending them to its store as one shard
+STORE_SHARD_ROWS = 256
+
+# Values at the end of each run that a sweep returns besides the summary statistics, per road
+FINAL_VALUES = ('mean_velocity_acc', 'mean_velocity_no_acc')
+
+
+def run_sweep(grid, replicas=1, seed=None, processes=None, progress=True, cache=None, store=None, **params):
+    """
+    Run headless simulations over a parameter grid in a process pool.
+
+    Grid points that differ only in BATCHED_PARAMETERS run batched together through
+    run_simulation_replicas, recording summary statistics only, in tasks of at most
+    SWEEP_BATCH_SLOTS car slots and at least one per process. Each grid point gets its own
+    seeds, spawned from seed in grid order, and a replica does not depend on what it is batched
+    with, so results do not depend on the number of processes or on the order in which tasks
+    finish. With a cache, only the replicas missing from it are run.
+
+    Parameters:
+        grid (dict): Parameter name -> values, one axis of the results per parameter, in order.
+        replicas (int, optional): Independent runs per grid point. Defaults to 1.
+        seed (int or np.random.SeedSequence, optional): Seed of the sweep; fresh entropy if None.
+        processes (int, optional): Worker processes; all CPUs if None, 1 to run in this process.
+        progress (bool or callable, optional): Print a line per finished grid point, or call
+            progress(done, total, point) with the parameters of the point. Defaults to True.
+        cache (ResultCache or bool, optional): Cache of run results, True for a ResultCache in
+            its default directory. Replicas found in it are not run again and new runs are
+            added to it. Only used with a seed.
+        store (SweepStore or str, optional): Store (or its directory) that gets one row per
+            (grid point, replica) as the results come in: the parameters of the run, 'replica',
+            '<series key>_<statistic>', the values at the end of the run and 'run' (run_key of
+            the run's parameters and seed). Runs the store already holds rows of are not added again.
+        **params: Parameters fixed over the sweep (keys of SWEEP_PARAMETERS).
+
+    Returns:
+        dict: 'axes' (parameter name -> array of the grid values), 'summary' (series key ->
+            statistic -> array of shape grid shape + (replicas,), like simulation_data['summary'])
+            and 'mean_velocity_acc' / 'mean_velocity_no_acc' (mean velocity of the cars at the
+            end of each run, same shape). Keys of roads that are not simulated are left out.
+    """
+    unknown = (set(grid) | set(params)) - set(SWEEP_PARAMETERS) - {'rho'}
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    if set(grid) & set(params):
+        raise ValueError(f"Parameters both fixed and on the grid: {sorted(set(grid) & set(params))}")
+    if {'rho', 'N'} <= set(grid) | set(params):
+        raise ValueError("rho and N cannot both be given.")
+    if params.get('roads', "both") not in ROAD_SELECTIONS:
+        raise ValueError(f"Unknown road selection: {params['roads']}")
+
+    if cache is True:
+        cache = ResultCache()
+    elif cache is False:
+        cache = None
+    if isinstance(store, str):
+        store = SweepStore(store)
+
+    axes = {name: np.asarray(values) for name, values in grid.items()}
+    shape = tuple(len(values) for values in axes.values())
+    indices = list(itertools.product(*(range(n) for n in shape)))
+    point_seeds = np.random.SeedSequence(seed).spawn(len(indices))
+
+    results = {'axes': axes, 'summary': {}}
+    rows = []
+    stored = store.runs() if store is not None else set()
+    tasks = []
+    cached_points = []
+    for index, point_seed in zip(indices, point_seeds):
+        point = {name: axes[name][i].item() for name, i in zip(axes, index)}
+        run_params = {**SWEEP_PARAMETERS, **params, **point, 'record': "summary"}
+        if 'rho' in run_params:
+            run_params['N'] = int(run_params.pop('rho') * (run_params['L'] / 2))
+        seeds = point_seed.spawn(replicas)
+
+        # Replicas found in the cache are not run again; without a seed, runs are never repeated
+        missing = list(range(replicas))
+        if cache is not None and seed is not None:
+            cached = {r: cache.get(run_params, seeds[r]) for r in range(replicas)}
+            missing = [r for r, result in cached.items() if result is None]
+            hits = [r for r in range(replicas) if r not in missing]
+            if hits:
+                point_results = _stack([cached[r] for r in hits])
+                _store(results, shape + (replicas,), index, hits, point_results)
+                if store is not None:
+                    _add_rows(rows, _rows(point, run_params, [seeds[r] for r in hits], hits, point_results, stored))
+        if missing:
+            tasks.append((index, point, run_params, [seeds[r] for r in missing], missing))
+        else:
+            cached_points.append(point)
+
+    total = len(indices)
+    for done, point in enumerate(cached_points, 1):
+        _report(progress, done, total, point, axes, cached=True)
+
+    pool = None
+    workers = 1 if processes == 1 else processes or multiprocessing.cpu_count()
+    batches = _batch(tasks, workers)
+    if workers == 1 or len(batches) < 2:
+        finished = map(_run_batch, batches)
+    else:
+        pool = multiprocessing.Pool(min(workers, len(batches)))
+        finished = pool.imap_unordered(_run_batch, batches)
+    finished = (point for batch_results in finished for point in batch_results)
+    try:
+        for done, (task, point_results) in enumerate(finished, len(cached_points) + 1):
+            index, point, run_params, seeds, replica_indices = task
+            _store(results, shape + (replicas,), index, replica_indices, point_results)
+            if store is not None:
+                _add_rows(rows, _rows(point, run_params, seeds, replica_indices, point_results, stored))
+                if sum(len(row['replica']) for row in rows) >= STORE_SHARD_ROWS:
+                    _append_rows(store, rows)
+            if cache is not None and seed is not None:
+                for k, replica_seed in enumerate(seeds):
+                    cache.put(run_params, replica_seed,
+                              {key: {name: values[k] for name, values in statistics.items()}
+                               for key, statistics in point_results['summary'].items()},
+                              final={key: point_results[key][k] for key in FINAL_VALUES if key in point_results})
+            _report(progress, done, total, point, axes)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        # Finished points are kept even if the sweep is interrupted
+        if rows:
+            _append_rows(store, rows)
+    return results
+
+
+def _batch(tasks, workers):
+    """
+    Group the tasks of grid points that differ only in BATCHED_PARAMETERS into batches.
+
+    Each group is sorted by N, so a batch pads its replicas little, and cut into contiguous
+    batches of about equal car slots: enough to keep every batch within SWEEP_BATCH_SLOTS and,
+    as far as there are points, the workers busy.
+
+    Parameters:
+        tasks (list): Tasks of grid points (index, point, run_params, seeds, replica_indices).
+        workers (int): Number of worker processes.
+
+    Returns:
+        list: Batches, each a list of tasks.
+    """
+    groups = {}
+    for task in tasks:
+        key = tuple(sorted((name, value) for name, value in task[2].items() if name not in BATCHED_PARAMETERS))
+        groups.setdefault(key, []).append(task)
+
+    batches = []
+    for group in groups.values():
+        group.sort(key=lambda task: task[2]['N'])
+        slots = np.cumsum([len(task[3]) * max(task[2]['N'], 1) for task in group])
+        n_batches = min(len(group), max(-(-slots[-1] // SWEEP_BATCH_SLOTS), -(-workers // len(groups))))
+        cuts = np.searchsorted(slots, slots[-1] * np.arange(1, n_batches) / n_batches, side='right')
+        bounds = [0, *cuts.tolist(), len(group)]
+        batches.extend(group[start:stop] for start, stop in zip(bounds, bounds[1:]) if stop > start)
+    return batches
+
+
+def _run_batch(batch):
+    """
+    Run the missing replicas of a batch of grid points (in a worker process) as one
+    run_simulation_replicas call and return the results of each point.
+    """
+    run_params = {name: value for name, value in batch[0][2].items() if name not in BATCHED_PARAMETERS}
+    seeds = [seed for task in batch for seed in task[3]]
+    batched = {name: np.concatenate([np.full(len(task[3]), task[2][name]) for task in batch])
+               for name in BATCHED_PARAMETERS}
+    road1, road2, simulation_data_list = run_simulation_replicas(seeds=seeds, **run_params, **batched)
+
+    final = {}
+    for key, road in zip(FINAL_VALUES, (road1, road2)):
+        if road is not None:
+            speed_sum = np.where(road.active, road.velocity, 0).sum(axis=1)
+            final[key] = speed_sum / np.maximum(road.n_cars, 1)
+
+    finished = []
+    start = 0
+    for task in batch:
+        stop = start + len(task[3])
+        point_data = simulation_data_list[start:stop]
+        point_results = {'summary': {key: {name: np.array([simulation_data['summary'][key][name]
+                                                           for simulation_data in point_data])
+                                           for name in statistics}
+                                     for key, statistics in point_data[0]['summary'].items()}}
+        for key, values in final.items():
+            point_results[key] = values[start:stop]
+        finished.append((task, point_results))
+        start = stop
+    return finished
+
+
+def _stack(cached_results):
+    """
+    Results of cached replicas (ResultCache.get) in the per-replica array form of _run_batch.
+    """
+    first = cached_results[0]
+    point_results = {'summary': {key: {name: np.array([result['summary'][key][name] for result in cached_results])
+                                       for name in statistics}
+                                 for key, statistics in first['summary'].items()}}
+    for key in first['final']:
+        point_results[key] = np.array([result['final'][key] for result in cached_results])
+    return point_results
+
+
+def _store(results, shape, index, replica_indices, point_results):
+    """
+    Write the results of some replicas of a grid point into the sweep result arrays.
+    """
+    for key, statistics in point_results['summary'].items():
+        for name, values in statistics.items():
+            results['summary'].setdefault(key, {}).setdefault(name, np.zeros(shape))[index + (replica_indices,)] = values
+    for key in FINAL_VALUES:
+        if key in point_results:
+            results.setdefault(key, np.zeros(shape))[index + (replica_indices,)] = point_results[key]
+
+
+def _rows(point, run_params, seeds, replica_indices, point_results, stored):
+    """
+    Store columns of some replicas of a grid point: one row per replica whose run is not
+    in stored (SweepStore.runs). None if every run is already stored.
+    """
+    keys = [run_key(run_params, seed) for seed in seeds]
+    new = [k for k, key in enumerate(keys) if key not in stored]
+    if not new:
+        return None
+
+    parameters = {**run_params, **point}
+    columns = {name: np.full(len(new), value) for name, value in parameters.items()}
+    columns['replica'] = np.asarray(replica_indices, dtype=np.int64)[new]
+    columns['run'] = np.array(keys)[new]
+    for key, statistics in point_results['summary'].items():
+        for name, values in statistics.items():
+            columns[f"{key}_{name}"] = values[new]
+    for key in FINAL_VALUES:
+        if key in point_results:
+            columns[key] = point_results[key][new]
+    return columns
+
+
+def _add_rows(rows, columns):
+    """
+    Buffer the columns of _rows, if any.
+    """
+    if columns is not None:
+        rows.append(columns)
+
+
+def _append_rows(store, rows):
+    """
+    Append buffered rows to the store as one shard and empty the buffer.
+    """
+    store.append({name: np.concatenate([row[name] for row in rows]) for name in rows[0]})
+    rows.clear()
+
+
+def _report(progress, done, total, point, axes, cached=False):
+    if callable(progress):
+        progress(done, total, point)
+    elif progress:
+        print(f"Sweep point {done}/{total}: "
+              + ", ".join(f"{name}={point[name]:.2f}" if isinstance(point[name], float)
+                          else f"{name}={point[name]}" for name in axes)
+              + (" (cached)" if cached else ""))
@@ -0,0 +1,109 @@
+# test_human_driver_table.py
+import numpy as np
+import pytest
+
+from Car import Car
+from VectorizedRoad import VectorizedRoad
+from human_driver_table import MIN_VELOCITY, human_driver_table
+from run_simulation import step_cars
+
+
+class FixedUniform:
+    """
+    Stands in for a car's generator: random() returns the number set for the current step,
+    so a Car and a VectorizedRoad slot can be given the same draw.
+    """
+
+    def __init__(self):
+        self.value = 0.0
+
+    def random(self):
+        return self.value
+
+
+def car_velocity(max_speed, speed_offset, velocity, distance, velocity_of_next_car):
+    """
+    Velocity after Car.update_velocity for a human driver without random slowdown.
+    """
+    car = Car(road_length=1000, cell_width=1, max_speed=max_speed, p_fault=0.0, p_slow=0.0,
+              position=0, velocity=velocity, rng=np.random.default_rng(0))
+    car.speed_offset = speed_offset
+    car.update_velocity(distance, velocity_of_next_car)
+    return car.velocity
+
+
+@pytest.mark.parametrize("max_speed, min_offset, max_offset, max_velocity", [
+    (4, -2, 2, 6),
+    (2, -2, 2, 4),
+    (5, -1, 1, 7),
+    (3, 0, 0, 3),
+    (1, -2, 2, 3),
+])
+def test_table_matches_car(max_speed, min_offset, max_offset, max_velocity):
+    """
+    Every table entry (beyond the distance cap too) matches Car.update_velocity.
+    Stopped cars use slow-to-start instead of the table.
+    """
+    table = human_driver_table(max_speed, min_offset, max_offset, max_velocity)
+    for offset in range(min_offset, max_offset + 1):
+        offset_index = table.offset_index(np.array([offset]))
+        for v in range(MIN_VELOCITY, max_velocity + 1):
+            if v == 0:
+                continue
+            for d in range(table.max_distance + 3):
+                for vn in range(MIN_VELOCITY, max_velocity + 1):
+                    got = table.lookup(np.array([v]), np.array([d]), np.array([vn]), offset_index)[0]
+                    assert got == car_velocity(max_speed, offset, v, d, vn), (v, d, vn, offset)
+
+
+def test_folded_max_speeds_match_car():
+    """
+    Replicas with different max speeds share one table built for the lowest one; every
+    car's lookup matches Car.update_velocity with its own replica's max speed.
+    """
+    max_speeds = np.array([2, 4, 5])
+    offsets = np.array([Car.SPEED_SLOW + Car.SPEED_NORMAL + Car.SPEED_FAST] * len(max_speeds))
+    road = VectorizedRoad(200, max_speeds, 0.0, 0.0, positions=np.arange(offsets.size).reshape(offsets.shape),
+                          velocities=np.ones(offsets.shape), speed_offsets=offsets)
+    table = road._human_table
+    assert table.max_speed == max_speeds.min()
+
+    for (row, column), offset in np.ndenumerate(offsets):
+        max_speed = int(max_speeds[row])
+        for v in range(MIN_VELOCITY, max_speed + offset + 1):
+            if v == 0:
+                continue
+            for d in range(table.max_distance + 3):
+                for vn in range(MIN_VELOCITY, table.max_velocity + 1):
+                    got = table.lookup(np.array([v]), np.array([d]), np.array([vn]),
+                                       road._offset_index[row, column:column + 1])[0]
+                    assert got == car_velocity(max_speed, int(offset), v, d, vn), (max_speed, v, d, vn, offset)
+
+
+@pytest.mark.parametrize("n_cars", [10, 40, 90])
+@pytest.mark.parametrize("acc_share", [0.0, 0.5])
+@pytest.mark.parametrize("seed", range(3))
+def test_vectorized_road_steps_like_cars(n_cars, acc_share, seed):
+    """
+    With the same uniform numbers, VectorizedRoad.step moves every car like step_cars
+    moves the Car objects.
+    """
+    road_length, max_speed, p_fault, p_slow, steps = 120, 4, 0.1, 0.5, 200
+    rng = np.random.default_rng(seed)
+    cars = []
+    for position, velocity in zip(rng.choice(road_length, n_cars, replace=False), rng.integers(0, 5, n_cars)):
+        car = Car(road_length, 1, max_speed, p_fault, p_slow, position=int(position), velocity=int(velocity),
+                  prob_faster=0.7, prob_slower=0.1, prob_normal=0.2,
+                  adaptive_cruise_control=bool(rng.random() < acc_share), rng=rng)
+        car.rng = FixedUniform()
+        cars.append(car)
+    road = VectorizedRoad.from_cars(cars, road_length, max_speed, p_fault, p_slow)
+
+    for step in range(steps):
+        random_values = rng.random(n_cars)
+        for car, value in zip(cars, random_values):
+            car.rng.value = value
+        step_cars(cars, road_length)
+        road.step(random_values[None])
+        np.testing.assert_array_equal(road.position[0], [car.position for car in cars], err_msg=f"step {step}")
+        np.testing.assert_array_equal(road.velocity[0], [car.velocity for car in cars], err_msg=f"step {step}")
@@ -0,0 +1,54 @@
+# test_placement.py
+import numpy as np
+import pytest
+
+from placement import PLACEMENTS, place_cars
+
+SIZES = [(120, 0), (120, 1), (120, 7), (120, 60), (120, 119), (120, 120), (1000, 333)]
+
+
+@pytest.mark.parametrize("placement", sorted(PLACEMENTS))
+@pytest.mark.parametrize("road_length, n_cars", SIZES)
+def test_distinct_cells_on_the_road(placement, road_length, n_cars):
+    cells = place_cars(np.random.default_rng(0), road_length, n_cars, placement)
+    assert cells.dtype == np.int64
+    assert len(cells) == n_cars
+    assert len(np.unique(cells)) == n_cars
+    assert ((cells >= 0) & (cells < road_length)).all()
+
+
+@pytest.mark.parametrize("road_length, n_cars", SIZES)
+def test_homogeneous_spacing_is_even(road_length, n_cars):
+    """
+    Gaps around the ring differ by at most one cell.
+    """
+    cells = place_cars(None, road_length, n_cars, "homogeneous")
+    if n_cars < 2:
+        return
+    gaps = np.diff(np.append(cells, cells[0] + road_length))
+    assert gaps.sum() == road_length
+    assert gaps.max() - gaps.min() <= 1
+
+
+@pytest.mark.parametrize("road_length, n_cars", SIZES)
+def test_megajam_is_contiguous(road_length, n_cars):
+    cells = place_cars(None, road_length, n_cars, "megajam")
+    np.testing.assert_array_equal(np.diff(cells), 1)
+
+
+def test_random_placement_is_reproducible_and_uniform():
+    """
+    The same seed gives the same cells, and over many draws every cell is used about equally often.
+    """
+    np.testing.assert_array_equal(place_cars(np.random.default_rng(3), 120, 60),
+                                  place_cars(np.random.default_rng(3), 120, 60))
+    rng = np.random.default_rng(4)
+    counts = np.bincount(np.concatenate([place_cars(rng, 50, 10) for _ in range(2000)]), minlength=50)
+    assert abs(counts / 2000 - 10 / 50).max() < 0.05
+
+
+def test_invalid_placements_raise():
+    with pytest.raises(ValueError):
+        place_cars(np.random.default_rng(0), 10, 11)
+    with pytest.raises(ValueError):
+        place_cars(np.random.default_rng(0), 10, 5, "clustered")
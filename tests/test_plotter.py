@@ -0,0 +1,105 @@
+# test_plotter.py
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+import HeadLessMeasurementAndPlotter as plotter_module
+from Car import Car
+from HeadLessMeasurementAndPlotter import HeadLessMeasurementAndPlotter
+from KeyframeTrajectory import KeyframeTrajectory
+from TrajectoryRecorder import load_trajectory
+from run_simulation import run_simulation, run_simulation_replicas
+
+TIME_SERIES_FIGURES = ("flow_rate_comparison.png", "jam_length_over_time.png", "fraction_stopped_over_time.png",
+                       "delay_over_time.png")
+READERS = {"memmap": load_trajectory, "keyframe": lambda directory: KeyframeTrajectory(directory).window()}
+
+
+def test_plot_all_skips_time_series_of_summary_runs(tmp_path):
+    """
+    Summary-only data draws the figures of the cars and leaves out the figures over time.
+    """
+    cars_road1, cars_road2, simulation_data = run_simulation(headless=True, L=120, N=40, steps=30, seed=2,
+                                                             record="summary")
+    HeadLessMeasurementAndPlotter(str(tmp_path)).plot_all(simulation_data, (cars_road1, cars_road2), processes=1)
+    written = set(os.listdir(tmp_path))
+    assert "velocity_cdf.png" in written
+    assert not written & set(TIME_SERIES_FIGURES)
+
+
+def test_plot_all_rejects_partial_series(tmp_path):
+    cars_road1, cars_road2, simulation_data = run_simulation(headless=True, L=120, N=40, steps=30, seed=2)
+    del simulation_data['delay_acc']
+    with pytest.raises(ValueError, match="delay_acc"):
+        HeadLessMeasurementAndPlotter(str(tmp_path)).plot_all(simulation_data, (cars_road1, cars_road2),
+                                                              processes=1)
+
+
+@pytest.mark.parametrize("trajectory_format", ["memmap", "keyframe"])
+def test_recorded_space_time_diagram_matches_arrays(tmp_path, trajectory_format):
+    """
+    Drawing a replica from its trajectory directory gives the image of drawing its arrays.
+    """
+    run_simulation_replicas(L=100, N=30, seeds=[1, 2], steps=60, record="summary",
+                            trajectory=str(tmp_path / "run"), trajectory_format=trajectory_format)
+    params = {'L': 100, 'vmax': 4}
+    plotter = HeadLessMeasurementAndPlotter(str(tmp_path))
+    image = plotter.plot_recorded_space_time_diagram(str(tmp_path / "run" / "road1"), params, replica=1)
+
+    recorded = READERS[trajectory_format](str(tmp_path / "run" / "road1"))
+    expected = plotter.plot_space_time_diagram(recorded['position'][:, 1], recorded['velocity'][:, 1], params,
+                                               recorded['active'][1])
+    np.testing.assert_array_equal(image, expected)
+
+
+def test_plot_all_draws_trajectories_in_workers(tmp_path):
+    cars_road1, cars_road2, simulation_data = run_simulation(headless=True, L=120, N=40, steps=30, seed=2,
+                                                             trajectory=str(tmp_path / "run"))
+    trajectories = {road: str(tmp_path / "run" / road) for road in ("road1", "road2")}
+    HeadLessMeasurementAndPlotter(str(tmp_path)).plot_all(simulation_data, (cars_road1, cars_road2),
+                                                          trajectories=trajectories, processes=2)
+    for road in trajectories:
+        assert os.path.exists(tmp_path / f"space_time_diagram_{road}.png")
+
+
+def test_space_time_diagram_colour_scale(tmp_path):
+    """
+    Stopped cars take the top of the colormap, cars at vmax + max(Car.SPEED_FAST) its bottom,
+    every speed in between its own colour, and empty cells are white.
+    """
+    top_speed = 4 + max(Car.SPEED_FAST)
+    velocity = np.arange(top_speed + 1)[None, :].repeat(3, axis=0)
+    position = (np.arange(top_speed + 1) * 2)[None, :].repeat(3, axis=0)
+    params = {'L': 2 * (top_speed + 1), 'vmax': 4}
+    image = HeadLessMeasurementAndPlotter(str(tmp_path)).plot_space_time_diagram(position, velocity, params)
+
+    assert image.dtype == np.uint8 and image.shape == (3, params['L'])
+    assert image[0, 0] == 255 and image[0, 2 * top_speed] == 1
+    assert len(np.unique(image[0, ::2])) == top_speed + 1
+    assert (image[:, 1::2] == 0).all()
+
+    saved = plt.imread(tmp_path / "space_time_diagram_road1.png")
+    colormap = plt.get_cmap("RdYlGn_r")
+    np.testing.assert_allclose(saved[0, 1], [1, 1, 1, 1])
+    np.testing.assert_allclose(saved[0, 0], colormap(1.0), atol=1 / 255)
+    np.testing.assert_allclose(saved[0, 2 * top_speed], colormap(0.0), atol=1 / 255)
+
+
+@pytest.mark.parametrize("max_size, shape", [((2000, 2000), (50, 100)), ((7, 40), (7, 34))])
+def test_space_time_diagram_batches_match_one_batch(tmp_path, monkeypatch, max_size, shape):
+    """
+    Reading the frames in small batches, pooled or not, gives the image of reading them at once.
+    """
+    params = {'L': 100, 'vmax': 4}
+    run_simulation_replicas(L=100, N=30, seeds=[3], steps=50, record="summary", trajectory=str(tmp_path / "run"))
+    recorded = load_trajectory(str(tmp_path / "run" / "road1"))
+    plotter = HeadLessMeasurementAndPlotter(str(tmp_path))
+    args = (recorded['position'][:, 0], recorded['velocity'][:, 0], params, recorded['active'][0])
+
+    whole = plotter.plot_space_time_diagram(*args, max_size=max_size)
+    monkeypatch.setattr(plotter_module, "SPACE_TIME_BATCH_PIXELS", 1)
+    batched = plotter.plot_space_time_diagram(*args, max_size=max_size)
+    np.testing.assert_array_equal(batched, whole)
+    assert whole.shape == shape
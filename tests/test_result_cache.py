@@ -0,0 +1,78 @@
+# test_result_cache.py
+import os
+
+import numpy as np
+import pytest
+
+from ResultCache import ResultCache, run_key
+
+PARAMS = {'L': 120, 'N': 60, 'p_fault': 0.1, 'engine': "vectorized"}
+SUMMARY = {'flow_rate_acc': {'mean': 0.5, 'var': 0.25, 'min': 0.0, 'max': 2.0}}
+
+
+def test_numpy_scalars_key_like_python_numbers():
+    numpy_params = {'L': np.int64(120), 'N': np.int32(60), 'p_fault': np.float64(0.1), 'engine': "vectorized"}
+    assert run_key(numpy_params, 1) == run_key(PARAMS, 1)
+    assert run_key(PARAMS, np.int64(1)) == run_key(PARAMS, 1)
+
+
+def test_seed_sequence_keys():
+    """
+    Equal seed sequences, also spawned ones, give equal keys; other entropy or children do not.
+    """
+    assert run_key(PARAMS, np.random.SeedSequence(5)) == run_key(PARAMS, np.random.SeedSequence(5))
+    first, second = np.random.SeedSequence(5).spawn(2)
+    assert run_key(PARAMS, first) == run_key(PARAMS, np.random.SeedSequence(5).spawn(2)[0])
+    assert len({run_key(PARAMS, first), run_key(PARAMS, second),
+                run_key(PARAMS, np.random.SeedSequence(6)), run_key(PARAMS, np.random.SeedSequence(5))}) == 4
+
+
+def test_key_depends_on_params_and_version(tmp_path):
+    assert run_key(PARAMS, 1) != run_key({**PARAMS, 'N': 61}, 1)
+    assert run_key(PARAMS, 1) != run_key(PARAMS, 2)
+    assert run_key(PARAMS, 1, version=1) != run_key(PARAMS, 1, version=2)
+    assert ResultCache(str(tmp_path), version=7).key(PARAMS, 1) == run_key(PARAMS, 1, version=7)
+
+
+def test_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    series = {'flow_rate_acc': np.arange(5, dtype=np.float32)}
+    cache.put(PARAMS, 3, SUMMARY, final={'mean_velocity_acc': 1.5}, series=series)
+    result = cache.get(PARAMS, 3)
+    assert result['summary'] == SUMMARY
+    assert result['final'] == {'mean_velocity_acc': 1.5}
+    np.testing.assert_array_equal(result['series']['flow_rate_acc'], series['flow_rate_acc'])
+    assert cache.get(PARAMS, 4) is None
+
+
+def test_get_refreshes_recency_for_eviction(tmp_path):
+    """
+    Eviction after a put drops the least recently read entry, not the oldest written one.
+    """
+    cache = ResultCache(str(tmp_path))
+    for seed in range(3):
+        cache.put(PARAMS, seed, SUMMARY)
+    # Written in order 0, 1, 2, a second apart
+    for age, seed in enumerate(range(3)):
+        os.utime(cache._path(cache.key(PARAMS, seed)), (1000 + age, 1000 + age))
+    assert cache.get(PARAMS, 0) is not None
+
+    entry_bytes = os.path.getsize(cache._path(cache.key(PARAMS, 0)))
+    cache.max_bytes = int(3.5 * entry_bytes)
+    cache.put(PARAMS, 3, SUMMARY)
+    assert [cache.get(PARAMS, seed) is not None for seed in range(4)] == [True, False, True, True]
+
+
+def test_corrupt_entry_returns_none(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.put(PARAMS, 0, SUMMARY)
+    cache.put(PARAMS, 1, SUMMARY)
+    path = cache._path(cache.key(PARAMS, 0))
+    with open(path, 'rb') as file:
+        data = file.read()
+    with open(path, 'wb') as file:
+        file.write(data[:len(data) // 2])
+    with open(cache._path(cache.key(PARAMS, 1)), 'wb') as file:
+        file.write(b"not an npz file")
+    assert cache.get(PARAMS, 0) is None
+    assert cache.get(PARAMS, 1) is None
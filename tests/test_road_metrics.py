@@ -0,0 +1,62 @@
+# test_road_metrics.py
+import numpy as np
+import pytest
+
+from RoadMetrics import jam_runs
+
+
+def reference_jams(stopped):
+    """
+    Jam sizes of one circular road, walking the ring from a free cell.
+    """
+    stopped = list(map(bool, stopped))
+    if all(stopped):
+        return [len(stopped)]
+    start = stopped.index(False)
+    ring = stopped[start:] + stopped[:start]
+    jams, size = [], 0
+    for cell in ring + [False]:
+        if cell:
+            size += 1
+        elif size:
+            jams.append(size)
+            size = 0
+    return jams
+
+
+@pytest.mark.parametrize("stopped, expected", [
+    ([1, 1, 0, 0, 1, 0, 1, 1], [4, 1]),   # The jam at cells 6, 7, 0, 1 wraps past the end
+    ([1, 0, 0, 0, 0, 0, 0, 1], [2]),
+    ([0, 1, 1, 0, 1, 1, 1, 0], [2, 3]),
+    ([1, 1, 1, 1, 1, 1, 1, 1], [8]),      # All stopped: one jam, not merged with itself
+    ([0, 0, 0, 0, 0, 0, 0, 0], []),       # Empty road
+    ([1, 0, 1, 0, 1, 0, 1, 0], [1, 1, 1, 1]),
+])
+def test_jam_runs_single_road(stopped, expected):
+    longest, count, sizes = jam_runs(np.array(stopped))
+    assert sorted(sizes.tolist()) == sorted(expected)
+    assert count == len(expected)
+    assert longest == max(expected, default=0)
+    assert jam_runs(np.array(stopped), sizes=False) == (longest, count)
+
+
+def test_jam_runs_replicas_match_reference():
+    """
+    Batched roads, including wrapping, all-stopped and empty ones, give the jams of each road alone.
+    """
+    rng = np.random.default_rng(0)
+    stopped = rng.random((200, 30)) < rng.random((200, 1))
+    stopped[0] = True
+    stopped[1] = False
+    stopped[2] = [True] * 3 + [False] * 24 + [True] * 3
+
+    longest, count, sizes = jam_runs(stopped)
+    longest_only, count_only = jam_runs(stopped, sizes=False)
+    np.testing.assert_array_equal(longest, longest_only)
+    np.testing.assert_array_equal(count, count_only)
+    for row, row_sizes in enumerate(sizes):
+        expected = reference_jams(stopped[row])
+        assert sorted(row_sizes.tolist()) == sorted(expected)
+        assert count[row] == len(expected)
+        assert longest[row] == max(expected, default=0)
+    assert longest[2] == 6 and count[2] == 1
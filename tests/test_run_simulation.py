@@ -0,0 +1,126 @@
+# test_run_simulation.py
+import itertools
+
+import numpy as np
+import pytest
+
+from SeriesRecorder import SIMULATION_DATA_METRICS
+from run_simulation import (ROAD_SELECTIONS, iter_simulation, run_road_configs, run_simulation,
+                            run_simulation_replicas)
+
+
+def snapshot_state(snapshot):
+    """
+    Copy of the live arrays of a snapshot, which change with the next step.
+    """
+    return {key: np.array(value) for key, value in snapshot.items() if key.startswith(('position', 'velocity'))}
+
+
+@pytest.mark.parametrize("engine", ["cars", "vectorized"])
+def test_iter_simulation_matches_run_simulation(engine):
+    """
+    The snapshots of iter_simulation are the steps run_simulation(headless=True) records.
+    """
+    params = dict(L=120, N=50, steps=150, seed=3, engine=engine)
+    _, _, simulation_data = run_simulation(headless=True, **params)
+    snapshots = list(iter_simulation(**params))
+
+    assert [snapshot['step'] for snapshot in snapshots] == list(range(150))
+    for road, key in ((1, 'flow_rate_acc'), (2, 'flow_rate_no_acc')):
+        speeds = [snapshot[f'metrics_road{road}']['average_speed'][0] for snapshot in snapshots]
+        np.testing.assert_array_equal(np.float32(speeds), simulation_data[key])
+    np.testing.assert_array_equal(snapshots[-1]['stop_start_road1'][0], simulation_data['stop_start_acc'])
+    np.testing.assert_array_equal(snapshots[-1]['stop_start_road2'][0], simulation_data['stop_start_no_acc'])
+
+
+@pytest.mark.parametrize("engine", ["cars", "vectorized"])
+def test_iter_simulation_unbounded(engine):
+    """
+    With steps=None the run goes on until the consumer stops, through the same states as a bounded run.
+    """
+    params = dict(L=120, N=40, seed=5, engine=engine)
+    unbounded = [snapshot_state(snapshot) for snapshot in itertools.islice(iter_simulation(steps=None, **params), 80)]
+    bounded = [snapshot_state(snapshot) for snapshot in iter_simulation(steps=80, **params)]
+    assert len(unbounded) == len(bounded) == 80
+    for got, expected in zip(unbounded, bounded):
+        for key in expected:
+            np.testing.assert_array_equal(got[key], expected[key])
+
+
+def test_iter_simulation_every():
+    """
+    every=k yields the steps 0, k, 2k, ... and nothing in between.
+    """
+    steps = [snapshot['step'] for snapshot in iter_simulation(steps=50, every=7, seed=1)]
+    assert steps == list(range(0, 50, 7))
+
+
+def road_keys(road):
+    """
+    Series keys of simulation_data that belong to a road (0 for road 1, 1 for road 2).
+    """
+    return [key for key, (index, _) in SIMULATION_DATA_METRICS.items() if index == road]
+
+
+@pytest.mark.parametrize("roads", ["acc", "human"])
+def test_single_road_matches_run_of_both(roads):
+    """
+    A single-road run gives that road's results of a run of both roads, and leaves out the other road.
+    """
+    (road,) = ROAD_SELECTIONS[roads]
+    stop_start = ('stop_start_acc', 'stop_start_no_acc')[road]
+    params = dict(L=200, N=150, steps=200, seed=11, engine="vectorized")
+    both = run_simulation(headless=True, **params)
+    single = run_simulation(headless=True, roads=roads, **params)
+
+    assert single[1 - road] is None
+    for key in road_keys(road):
+        np.testing.assert_array_equal(single[2][key], both[2][key])
+        assert single[2]['summary'][key] == both[2]['summary'][key]
+    assert single[2][stop_start] == both[2][stop_start]
+    for key in road_keys(1 - road):
+        assert key not in single[2] and key not in single[2]['summary']
+    assert [car.position for car in single[road]] == [car.position for car in both[road]]
+
+
+@pytest.mark.parametrize("roads", ["acc", "human"])
+def test_single_road_replicas_match_run_of_both(roads):
+    """
+    The same holds for every replica of a batched run.
+    """
+    (road,) = ROAD_SELECTIONS[roads]
+    params = dict(L=200, N=[30, 120], seeds=[1, 2], steps=150, record="summary")
+    both = run_simulation_replicas(**params)
+    single = run_simulation_replicas(roads=roads, **params)
+
+    assert single[1 - road] is None
+    np.testing.assert_array_equal(single[road].position, both[road].position)
+    for single_data, both_data in zip(single[2], both[2]):
+        for key in road_keys(road):
+            assert single_data['summary'][key] == both_data['summary'][key]
+
+
+@pytest.mark.parametrize("record", ["full", "summary"])
+def test_road_configs_match_solo_runs(record):
+    """
+    Every road of a batched run of configurations gives the results of running its configuration alone.
+    """
+    configs = [
+        {'cruise_control_percentage': 0},
+        {'cruise_control_percentage': 50, 'N': 90},
+        {'cruise_control_percentage': 100, 'vmax': 5, 'p_fault': 0.3},
+        {'N': 20, 'vmax': 2, 'p_slow': 0.1, 'prob_faster': 0.2, 'prob_normal': 0.7},
+    ]
+    seeds = [4, 5, 6, 7]
+    road, batched = run_road_configs(configs, seeds=seeds, L=150, steps=120, record=record)
+
+    for r, (config, seed) in enumerate(zip(configs, seeds)):
+        solo_road, (solo,) = run_road_configs([config], seeds=[seed], L=150, steps=120, record=record)
+        n_cars = solo_road.n_cars[0]
+        np.testing.assert_array_equal(road.position[r, :n_cars], solo_road.position[0])
+        assert batched[r]['summary'] == solo['summary']
+        assert batched[r]['stop_start_acc'] == solo['stop_start_acc']
+        assert batched[r]['cruise_control_percentage'] == solo['cruise_control_percentage']
+        if record == "full":
+            for key in road_keys(0):
+                np.testing.assert_array_equal(batched[r][key], solo[key])
@@ -0,0 +1,68 @@
+# test_run_sweep.py
+import numpy as np
+import pytest
+
+from ResultCache import ResultCache
+from SweepStore import SweepStore
+from run_sweep import run_sweep
+from run_simulation import run_simulation_replicas
+
+
+@pytest.mark.parametrize("grid", [
+    {'N': [5, 30, 60], 'p_fault': [0.0, 0.3]},
+    {'rho': [0.5, 1.5], 'vmax': [3, 5]},
+])
+def test_batched_sweep_matches_single_points(grid):
+    """
+    Grid points batched together give the results of running each point on its own.
+    """
+    replicas = 2
+    results = run_sweep(grid, replicas=replicas, seed=7, steps=120, processes=1, progress=False)
+
+    shape = tuple(len(values) for values in grid.values())
+    point_seeds = np.random.SeedSequence(7).spawn(int(np.prod(shape)))
+    for flat, index in enumerate(np.ndindex(*shape)):
+        point = {name: values[i] for (name, values), i in zip(grid.items(), index)}
+        if 'rho' in point:
+            point['N'] = int(point.pop('rho') * 60)
+        _, _, simulation_data_list = run_simulation_replicas(
+            seeds=point_seeds[flat].spawn(replicas), steps=120, record="summary", **point)
+        for key, statistics in simulation_data_list[0]['summary'].items():
+            for name in statistics:
+                expected = [simulation_data['summary'][key][name] for simulation_data in simulation_data_list]
+                np.testing.assert_array_equal(results['summary'][key][name][index], expected)
+
+
+def test_rerun_does_not_duplicate_store_rows(tmp_path):
+    """
+    Rerunning a seeded sweep into the same store, from the cache or not, adds no rows,
+    while runs of other seeds are added; a cleared store gets every row back from the cache.
+    """
+    cache = ResultCache(str(tmp_path / "cache"))
+    store = SweepStore(str(tmp_path / "store"))
+    grid = {'rho': [0.5, 1.0, 1.5], 'p_fault': [0.0, 0.2]}
+    sweep = dict(replicas=3, seed=5, steps=50, processes=1, progress=False, store=store, roads="acc")
+
+    run_sweep(grid, cache=cache, **sweep)
+    run_sweep(grid, cache=cache, **sweep)
+    run_sweep(grid, cache=None, **sweep)
+    assert len(store.load(['replica'])['replica']) == 3 * 6
+
+    # Points of another grid get other seeds, so they are other runs
+    run_sweep({'rho': [0.5, 1.0], 'p_fault': [0.2]}, cache=cache, **sweep)
+    runs = store.load(['run'])['run']
+    assert len(runs) == len(set(runs)) == 3 * (6 + 2)
+
+    store.clear()
+    run_sweep(grid, cache=cache, **sweep)
+    assert len(store.load(['replica'])['replica']) == 3 * 6
+
+
+@pytest.mark.parametrize("grid, params", [
+    ({'rho': [0.5, 1.0]}, {'N': 30}),
+    ({'N': [20, 40]}, {'rho': 0.5}),
+    ({'rho': [0.5], 'N': [20]}, {}),
+])
+def test_rho_and_n_cannot_both_be_given(grid, params):
+    with pytest.raises(ValueError, match="rho and N"):
+        run_sweep(grid, steps=10, processes=1, progress=False, **params)
@@ -0,0 +1,16 @@
+# test_series_recorder.py
+import pytest
+
+from run_simulation import run_simulation_replicas
+
+
+@pytest.mark.parametrize("record_every", [1, 7])
+def test_summary_does_not_depend_on_recording_level(record_every):
+    """
+    record="full" and record="summary" give the same statistics for the same seeds.
+    """
+    runs = {record: run_simulation_replicas(N=[30, 80], seeds=[1, 2], steps=200, record=record,
+                                            record_every=record_every)[2]
+            for record in ("full", "summary")}
+    for full, summary in zip(runs["full"], runs["summary"]):
+        assert full['summary'] == summary['summary']
@@ -0,0 +1,45 @@
+# test_trajectory.py
+import numpy as np
+import pytest
+
+from KeyframeTrajectory import KeyframeTrajectory
+from TrajectoryRecorder import load_trajectory
+from run_simulation import run_simulation_replicas
+
+
+@pytest.mark.parametrize("trajectory_format", ["memmap", "keyframe"])
+def test_padded_batch_on_long_road(tmp_path, trajectory_format):
+    """
+    Padding slots of a batch on a road near the int16 limit are stored as 0 and the
+    cars' states are stored exactly, in both formats.
+    """
+    road_length, steps = 32760, 40
+    road1, _, _ = run_simulation_replicas(L=road_length, N=[5, 40], seeds=[1, 2], steps=steps, record="summary",
+                                          roads="acc", trajectory=str(tmp_path), trajectory_format=trajectory_format)
+    if trajectory_format == "memmap":
+        frames = load_trajectory(str(tmp_path / "road1"))
+    else:
+        frames = KeyframeTrajectory(str(tmp_path / "road1")).window()
+
+    active = frames['active']
+    np.testing.assert_array_equal(active, road1.active)
+    assert not frames['position'][:, ~active].any()
+    assert not frames['velocity'][:, ~active].any()
+    last_position = np.asarray(frames['position'][-1], dtype=np.int64)
+    last_velocity = np.asarray(frames['velocity'][-1], dtype=np.int64)
+    np.testing.assert_array_equal(last_position[active], road1.position[active])
+    np.testing.assert_array_equal(last_velocity[active], road1.velocity[active])
+
+
+def test_formats_agree(tmp_path):
+    """
+    load_trajectory and KeyframeTrajectory.window give the same frames, padding included.
+    """
+    for trajectory_format in ("memmap", "keyframe"):
+        run_simulation_replicas(L=300, N=[20, 90], seeds=[3, 4], steps=300, record="summary",
+                                trajectory=str(tmp_path / trajectory_format), trajectory_format=trajectory_format)
+    for road in ("road1", "road2"):
+        memmap = load_trajectory(str(tmp_path / "memmap" / road), start=50, stop=280)
+        keyframe = KeyframeTrajectory(str(tmp_path / "keyframe" / road)).window(start=50, stop=280)
+        for key in ('time_steps', 'position', 'velocity', 'active'):
+            np.testing.assert_array_equal(memmap[key], keyframe[key])
@@ -0,0 +1,28 @@
+# test_vectorized_road.py
+import numpy as np
+import pytest
+
+from VectorizedRoad import VectorizedRoad
+
+
+def _run(n_cars, track_order, road_length=120, steps=300, seed=0):
+    rngs = [np.random.default_rng([seed, r]) for r in range(len(n_cars))]
+    road = VectorizedRoad.from_rngs(rngs, road_length, n_cars, 4, 0.1, 0.5, 0.7, 0.1, 0.2,
+                                    cruise_control_percentage=30)
+    road._track_order = track_order
+    uniforms = np.random.default_rng(seed + 1000).random((steps,) + road.shape)
+    states = []
+    for u in uniforms:
+        road.step(u)
+        states.append((road.position.copy(), road.velocity.copy()))
+    return states
+
+
+@pytest.mark.parametrize("n_cars", [[20], [60], [90], [110], [1, 40, 110, 0], [120, 119, 60]])
+@pytest.mark.parametrize("seed", range(3))
+def test_tracked_order_matches_sorting_every_step(n_cars, seed):
+    # Dense roads put several cars in one cell and make cars back past each other
+    tracked = _run(n_cars, True, seed=seed)
+    for step, (state, expected) in enumerate(zip(tracked, _run(n_cars, False, seed=seed))):
+        assert np.array_equal(state[0], expected[0]), f"positions differ at step {step}"
+        assert np.array_equal(state[1], expected[1]), f"velocities differ at step {step}"